@@ -8,4 +8,5 @@ class AddressAdmin(admin.ModelAdmin):
         'latitude',
         'longitude',
         'last_handle_date',
-    )
\ No newline at end of file
+    )
+    readonly_fields = ('normalized_address',)
\ No newline at end of file
@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Address
+
+
+class GeocodeCache:
+    """Двухуровневый кэш геокодера: LRU в памяти процесса перед таблицей Address.
+    Запись считается свежей settings.GEOCODE_CACHE_TTL_DAYS дней с
+    last_handle_date, а ненайденный адрес (без координат) -
+    settings.GEOCODE_NEGATIVE_TTL_DAYS дней, после чего запрашивается заново.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or settings.GEOCODE_LRU_SIZE
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(
+            ('lru_hits', 'db_hits', 'misses', 'expired', 'pending'),
+            0,
+        )
+
+    @staticmethod
+    def is_fresh(coordinates, handled_at):
+        ttl_days = (
+            settings.GEOCODE_CACHE_TTL_DAYS if coordinates
+            else settings.GEOCODE_NEGATIVE_TTL_DAYS
+        )
+        return handled_at + timedelta(days=ttl_days) > timezone.localdate()
+
+    def put(self, key, coordinates, handled_at):
+        with self.lock:
+            self.entries[key] = (coordinates, handled_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get_from_memory(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if not entry:
+                    continue
+                coordinates, handled_at = entry
+                if not self.is_fresh(coordinates, handled_at):
+                    del self.entries[key]
+                    continue
+                self.entries.move_to_end(key)
+                found[key] = coordinates
+            self.counters['lru_hits'] += len(found)
+        return found
+
+    def lookup(self, keys):
+        """
+        Ищем адреса сначала в памяти, затем в БД одним запросом
+        :param keys: множество нормализованных адресов, см. normalize_address
+        :return: словарь найденных свежих адресов (координаты или None,
+            если адрес известен как ненайденный), словарь просроченных и
+            ожидающих геокодера адресов с id записей и множество адресов,
+            которых нет нигде
+        """
+        found = self.get_from_memory(keys)
+        stale = {}
+        db_hits = pending = 0
+        places = Address.objects.filter(
+            normalized_address__in=keys - found.keys(),
+        )
+        for place in places:
+            key = place.normalized_address
+            coordinates = place.coordinates
+            if place.status == Address.PENDING:
+                stale[key] = place.id
+                pending += 1
+                continue
+            if not self.is_fresh(coordinates, place.last_handle_date):
+                stale[key] = place.id
+                continue
+            found[key] = coordinates
+            db_hits += 1
+            self.put(key, coordinates, place.last_handle_date)
+        missed = keys - found.keys() - stale.keys()
+        with self.lock:
+            self.counters['db_hits'] += db_hits
+            self.counters['pending'] += pending
+            self.counters['expired'] += len(stale) - pending
+            self.counters['misses'] += len(missed)
+        return found, stale, missed
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from coordinates import RateLimiter, fetch_coordinates
+from .cache import GeocodeCache
+from .models import Address
+from .normalization import normalize_address
+
+
+cache = GeocodeCache()
+
+
+def get_keys(addresses):
+    """Словарь адрес - нормализованный ключ, пустые адреса пропускаются."""
+    return {
+        address: normalize_address(address)
+        for address in addresses if address
+    }
+
+
+def geocode_deferred(addresses):
+    """
+    Возвращает известные координаты, не обращаясь к Geocode Api.
+    Неизвестные и просроченные адреса ставятся в очередь - сохраняются
+    в Address со статусом «ожидает геокодера», их найдет
+    resolve_pending_addresses
+    :param addresses: адреса, повторы и разные написания допустимы
+    :return: словарь адрес - (широта, долгота) или None, если не найден;
+        адресов из очереди в нем нет
+    """
+    keys = get_keys(addresses)
+    raw_addresses = {key: address for address, key in keys.items()}
+    found, stale, missed = cache.lookup(set(raw_addresses))
+
+    Address.objects.bulk_create(
+        [
+            Address(address=raw_addresses[key], normalized_address=key)
+            for key in missed
+        ],
+        ignore_conflicts=True,
+    )
+    Address.objects.filter(id__in=stale.values()) \
+                   .exclude(status=Address.PENDING) \
+                   .update(status=Address.PENDING)
+    return {
+        address: found[key]
+        for address, key in keys.items() if key in found
+    }
+
+
+def geocode_many(addresses, workers=None, qps=None):
+    """
+    Геокодирует сразу много адресов, дожидаясь ответа Geocode Api.
+    Свежие адреса берутся из кэша, остальные запрашиваются параллельно
+    с ограничением частоты. Новые адреса сохраняются одной вставкой,
+    просроченные и ожидавшие в очереди - одним bulk_update. Адреса, для
+    которых геокодер так и не ответил, в результат не попадают
+    :param addresses: адреса, повторы и разные написания одного адреса
+        допустимы - они сводятся к одному ключу normalize_address
+    :param workers: число потоков, по умолчанию settings.GEOCODE_WORKERS
+    :param qps: запросов в секунду, по умолчанию settings.GEOCODE_QPS
+    :return: словарь адрес - (широта, долгота) или None, если не найден
+    """
+    keys = get_keys(addresses)
+    # Один запрос к геокодеру на каждый нормализованный адрес
+    raw_addresses = {key: address for address, key in keys.items()}
+    found, stale, missed = cache.lookup(set(raw_addresses))
+    to_fetch = [*stale, *missed]
+    if not to_fetch:
+        return {address: found[key] for address, key in keys.items()}
+
+    rate_limiter = RateLimiter(qps or settings.GEOCODE_QPS)
+
+    def fetch(key):
+        try:
+            return fetch_coordinates(
+                address=raw_addresses[key],
+                yandex_token=settings.YANDEX_GEOCODE_API_KEY,
+                rate_limiter=rate_limiter,
+            )
+        except requests.RequestException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers or settings.GEOCODE_WORKERS) as executor:
+        fetched = dict(zip(to_fetch, executor.map(fetch, to_fetch)))
+
+    today = timezone.localdate()
+    new_places = []
+    refreshed_places = []
+    failed_ids = []
+    for key, coordinates in fetched.items():
+        if coordinates is False:
+            if key in stale:
+                failed_ids.append(stale[key])
+            continue
+        latitude = longitude = None
+        status = Address.NOT_FOUND
+        if coordinates:
+            longitude, latitude = map(Decimal, coordinates)
+            status = Address.RESOLVED
+        place = Address(
+            id=stale.get(key),
+            address=raw_addresses[key],
+            normalized_address=key,
+            latitude=latitude,
+            longitude=longitude,
+            status=status,
+            last_handle_date=today,
+        )
+        found[key] = place.coordinates
+        cache.put(key, place.coordinates, today)
+        if key in stale:
+            refreshed_places.append(place)
+        else:
+            new_places.append(place)
+
+    # bulk_create и bulk_update не вызывают pre_save
+    Address.objects.bulk_create(new_places, ignore_conflicts=True)
+    Address.objects.bulk_update(
+        refreshed_places,
+        fields=[
+            'latitude', 'longitude', 'status', 'last_handle_date',
+            'failed_attempts', 'next_attempt_at',
+        ],
+    )
+    postpone_addresses(failed_ids)
+    return {
+        address: found[key]
+        for address, key in keys.items() if key in found
+    }
+
+
+def postpone_addresses(address_ids):
+    """
+    Откладываем адреса, на которые геокодер не ответил: пауза удваивается
+    с каждой неудачей подряд, чтобы они не занимали очередь и квоту
+    :param address_ids: id записей Address
+    """
+    now = timezone.now()
+    places = Address.objects.filter(id__in=address_ids).only('id', 'failed_attempts')
+    for place in places:
+        delay = settings.GEOCODE_RETRY_DELAY * 2 ** min(place.failed_attempts, 16)
+        place.failed_attempts += 1
+        place.next_attempt_at = now + min(delay, settings.GEOCODE_RETRY_MAX_DELAY)
+    Address.objects.bulk_update(places, fields=['failed_attempts', 'next_attempt_at'])
+
+
+def resolve_pending_addresses(limit=None, **kwargs):
+    """
+    Разбирает очередь адресов, ожидающих геокодера. Отложенные после
+    неудачи адреса ждут своего next_attempt_at и не мешают новым
+    :param limit: сколько адресов взять за раз
+    :param kwargs: параметры geocode_many
+    :return: сколько адресов получили ответ геокодера
+    """
+    due = Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now())
+    addresses = Address.objects.filter(due, status=Address.PENDING) \
+                               .order_by(F('next_attempt_at').asc(nulls_first=True), 'id') \
+                               .values_list('address', flat=True)
+    if limit:
+        addresses = addresses[:limit]
+    return len(geocode_many(list(addresses), **kwargs))
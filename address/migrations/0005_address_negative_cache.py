@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:07
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('address', '0004_alter_address_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='address',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MaxValueValidator(90), django.core.validators.MinValueValidator(-90)], verbose_name='Широта'),
+        ),
+        migrations.AlterField(
+            model_name='address',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MaxValueValidator(180), django.core.validators.MinValueValidator(-180)], verbose_name='Долгота'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+import re
+
+from django.db import migrations, models
+
+
+# Копия address.normalization на момент миграции: ключи в базе должны
+# совпасть с тем, что считал код этой версии, как бы он ни менялся потом
+ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'ш': 'шоссе',
+    'наб': 'набережная',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'д': 'дом',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+SEPARATORS = re.compile(r'[\s.,;:!?()"«»\'/\\]+')
+
+
+def normalize_address(address):
+    """
+    Ключ адреса для поиска в кэше геокодера: без регистра, пунктуации,
+    лишних пробелов и с раскрытыми сокращениями вроде «ул.» и «д.»
+    :param address: адрес в том виде, в каком его ввели
+    """
+    address = address.lower().replace('ё', 'е')
+    words = []
+    for word in SEPARATORS.split(address):
+        word = word.strip('-')
+        if word:
+            words.append(ABBREVIATIONS.get(word, word))
+    return ' '.join(words)
+
+
+def merge_duplicate_addresses(apps, schema_editor):
+    """Заполняем нормализованный адрес и оставляем одну запись на ключ:
+    с координатами и самую свежую.
+    """
+    Address = apps.get_model('address', 'Address')
+    kept_addresses = {}
+    duplicate_ids = []
+    places = Address.objects.order_by('-last_handle_date', '-id')
+    for place in places.iterator():
+        key = normalize_address(place.address)
+        kept = kept_addresses.get(key)
+        if kept is None:
+            kept_addresses[key] = place
+            continue
+        if kept.latitude is None and place.latitude is not None:
+            kept_addresses[key] = place
+            duplicate_ids.append(kept.id)
+            continue
+        duplicate_ids.append(place.id)
+
+    Address.objects.filter(id__in=duplicate_ids).delete()
+    places = list(kept_addresses.items())
+    for key, place in places:
+        place.normalized_address = key
+    Address.objects.bulk_update(
+        [place for _, place in places],
+        fields=['normalized_address'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('address', '0005_address_negative_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='normalized_address',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(
+            merge_duplicate_addresses,
+            migrations.RunPython.noop,
+        ),
+        migrations.AlterField(
+            model_name='address',
+            name='normalized_address',
+            field=models.TextField(help_text='ключ для поиска без учета регистра, пунктуации и сокращений', unique=True, verbose_name='Нормализованный адрес'),
+        ),
+    ]
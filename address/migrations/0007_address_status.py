@@ -0,0 +1,29 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+def set_address_status(apps, schema_editor):
+    """Все существующие адреса уже обработаны геокодером."""
+    Address = apps.get_model('address', 'Address')
+    Address.objects.filter(latitude__isnull=False).update(status=2)
+    Address.objects.filter(latitude__isnull=True).update(status=3)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('address', '0006_address_normalized_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Ожидает геокодера'), (2, 'Координаты найдены'), (3, 'Адрес не найден')], db_index=True, default=1, verbose_name='Статус'),
+        ),
+        migrations.RunPython(
+            set_address_status,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('address', '0007_address_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='failed_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Неудачных запросов к геокодеру подряд'),
+        ),
+        migrations.AddField(
+            model_name='address',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Следующий запрос к геокодеру не раньше'),
+        ),
+    ]
@@ -1,21 +1,36 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.dispatch import receiver
 from django.db.models.signals import pre_save
-from coordinates import fetch_coordinates
-from django.conf import settings
+from .normalization import normalize_address
 
 
 class Address(models.Model):
     """Модель адреса."""
+    PENDING = 1
+    RESOLVED = 2
+    NOT_FOUND = 3
+    STATUSES = (
+        (PENDING, 'Ожидает геокодера'),
+        (RESOLVED, 'Координаты найдены'),
+        (NOT_FOUND, 'Адрес не найден'),
+    )
     address = models.TextField(
         verbose_name='Адрес места',
         unique=True,
     )
+    normalized_address = models.TextField(
+        verbose_name='Нормализованный адрес',
+        help_text='ключ для поиска без учета регистра, пунктуации и сокращений',
+        unique=True,
+    )
     latitude = models.DecimalField(
         max_digits=9,
         decimal_places=6,
         verbose_name='Широта',
+        null=True,
+        blank=True,
         validators=[
             MaxValueValidator(90),
             MinValueValidator(-90),
@@ -25,25 +40,68 @@ class Address(models.Model):
         max_digits=9,
         decimal_places=6,
         verbose_name='Долгота',
+        null=True,
+        blank=True,
         validators=[
             MaxValueValidator(180),
             MinValueValidator(-180),
         ]
     )
+    status = models.PositiveSmallIntegerField(
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус',
+        db_index=True,
+    )
     last_handle_date = models.DateField(
         auto_now=True,
         verbose_name='Дата крайнего обращения к Геокодеру',
     )
+    failed_attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Неудачных запросов к геокодеру подряд',
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Следующий запрос к геокодеру не раньше',
+    )
 
     class Meta:
         verbose_name = 'адрес'
         verbose_name_plural = 'адреса'
 
+    def clean(self):
+        """Нормализованный адрес уникален, но в админке не редактируется:
+        другое написание уже известного адреса - ошибка формы, а не 500.
+        """
+        super().clean()
+        duplicate = Address.objects.filter(
+            normalized_address=normalize_address(self.address),
+        ).exclude(pk=self.pk).first()
+        if duplicate:
+            raise ValidationError({
+                'address': f'Этот адрес уже есть в базе: «{duplicate.address}»',
+            })
+
+    @property
+    def coordinates(self):
+        """Широта и долгота или None, если геокодер не нашел адрес."""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
+
+
+@receiver(pre_save, sender=Address)
+def fill_normalized_address(sender, instance, *args, **kwargs):
+    instance.normalized_address = normalize_address(instance.address)
+
 
 @receiver(pre_save, sender=Address)
 def check_latitude_and_longitude(sender, instance, *args, **kwargs):
-    if not (instance.latitude or instance.longitude):
-        instance.longitude, instance.latitude = fetch_coordinates(
-            instance.address,
-            settings.YANDEX_GEOCODE_API_KEY,
-        )
+    """Адрес без координат сохраняется сразу, его найдет фоновый геокодер."""
+    if instance.coordinates:
+        instance.status = Address.RESOLVED
+    elif instance.status == Address.RESOLVED:
+        instance.status = Address.PENDING
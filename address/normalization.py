@@ -0,0 +1,41 @@
+import re
+
+
+ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'ул': 'улица',
+    'пр': 'проспект',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'ш': 'шоссе',
+    'наб': 'набережная',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'д': 'дом',
+    'корп': 'корпус',
+    'к': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+SEPARATORS = re.compile(r'[\s.,;:!?()"«»\'/\\]+')
+
+
+def normalize_address(address):
+    """
+    Ключ адреса для поиска в кэше геокодера: без регистра, пунктуации,
+    лишних пробелов и с раскрытыми сокращениями вроде «ул.» и «д.»
+    :param address: адрес в том виде, в каком его ввели
+    """
+    address = address.lower().replace('ё', 'е')
+    words = []
+    for word in SEPARATORS.split(address):
+        word = word.strip('-')
+        if word:
+            words.append(ABBREVIATIONS.get(word, word))
+    return ' '.join(words)
@@ -1,3 +1,192 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .geocoder import (cache, geocode_deferred, geocode_many,
+                       resolve_pending_addresses)
+from .models import Address
+from .normalization import normalize_address
+
+
+def fake_fetch_coordinates(address, **kwargs):
+    if address == 'Нигде':
+        return None
+    if address == 'Сломанный':
+        raise requests.ConnectionError()
+    return ['37.617698', '55.755864']
+
+
+@patch('address.geocoder.fetch_coordinates', side_effect=fake_fetch_coordinates)
+class TestGeocodeMany(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Address.objects.create(
+            address='Известный',
+            latitude=Decimal('59.938784'),
+            longitude=Decimal('30.314997'),
+        )
+
+    def test_known_addresses_are_not_requested(self, fetch):
+        """Адреса из БД не запрашиваются у геокодера повторно."""
+        coordinates = geocode_many(['Известный', 'Новый', 'Новый'])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(
+            coordinates['Известный'],
+            (Decimal('59.938784'), Decimal('30.314997')),
+        )
+        self.assertEqual(
+            coordinates['Новый'],
+            (Decimal('55.755864'), Decimal('37.617698')),
+        )
+        self.assertTrue(Address.objects.filter(address='Новый').exists())
+
+    def test_address_variants_share_one_request(self, fetch):
+        """Написания одного адреса геокодируются одним запросом."""
+        coordinates = geocode_many([
+            'Москва, ул. Новый Арбат, 1',
+            'москва  ул новый арбат 1',
+        ])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(len(set(coordinates.values())), 1)
+        self.assertEqual(len(coordinates), 2)
+        self.assertEqual(Address.objects.count(), 2)
+
+    def test_not_found_and_failed(self, fetch):
+        """Ненайденный адрес кэшируется, упавший запрос - нет."""
+        coordinates = geocode_many(['Нигде', 'Сломанный'], qps=0)
+        self.assertIsNone(coordinates['Нигде'])
+        self.assertNotIn('Сломанный', coordinates)
+        self.assertTrue(Address.objects.get(address='Нигде').coordinates is None)
+        self.assertFalse(Address.objects.filter(address='Сломанный').exists())
+
+        cache.clear()
+        geocode_many(['Нигде'])
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_memory_tier(self, fetch):
+        """Повторный запрос обслуживается из памяти без обращения к БД."""
+        geocode_many(['Известный'])
+        lru_hits = cache.stats()['lru_hits']
+        with self.assertNumQueries(0):
+            geocode_many(['Известный'])
+        self.assertEqual(cache.stats()['lru_hits'], lru_hits + 1)
+
+    @override_settings(GEOCODE_CACHE_TTL_DAYS=30)
+    def test_expired_address_is_refreshed(self, fetch):
+        """Просроченный адрес запрашивается заново и обновляется в БД."""
+        Address.objects.filter(address='Известный').update(
+            last_handle_date=timezone.localdate() - timedelta(days=31),
+        )
+        expired = cache.stats()['expired']
+        coordinates = geocode_many(['Известный'])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(cache.stats()['expired'], expired + 1)
+        self.assertEqual(
+            coordinates['Известный'],
+            (Decimal('55.755864'), Decimal('37.617698')),
+        )
+        place = Address.objects.get(address='Известный')
+        self.assertEqual(place.last_handle_date, timezone.localdate())
+        self.assertEqual(place.latitude, Decimal('55.755864'))
+
+
+@patch('address.geocoder.fetch_coordinates', side_effect=fake_fetch_coordinates)
+class TestGeocodeDeferred(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unknown_address_is_queued(self, fetch):
+        """Новый адрес сохраняется в очередь без запроса к геокодеру."""
+        self.assertEqual(geocode_deferred(['Новый', 'Нигде']), {})
+        fetch.assert_not_called()
+        self.assertEqual(
+            Address.objects.filter(status=Address.PENDING).count(),
+            2,
+        )
+
+        self.assertEqual(resolve_pending_addresses(), 2)
+        coordinates = geocode_deferred(['Новый', 'Нигде'])
+        self.assertEqual(
+            coordinates['Новый'],
+            (Decimal('55.755864'), Decimal('37.617698')),
+        )
+        self.assertIsNone(coordinates['Нигде'])
+        self.assertFalse(Address.objects.filter(status=Address.PENDING).exists())
+
+    def test_failed_address_stays_in_queue(self, fetch):
+        """Адрес, на который геокодер не ответил, остается в очереди."""
+        geocode_deferred(['Сломанный'])
+        self.assertEqual(resolve_pending_addresses(), 0)
+        self.assertEqual(
+            Address.objects.get(address='Сломанный').status,
+            Address.PENDING,
+        )
+
+    @override_settings(GEOCODE_RETRY_DELAY=timedelta(minutes=1))
+    def test_failed_address_is_postponed(self, fetch):
+        """Упавший адрес откладывается и не занимает очередь новых."""
+        geocode_deferred(['Сломанный'])
+        resolve_pending_addresses(limit=1)
+        failed = Address.objects.get(address='Сломанный')
+        self.assertEqual(failed.failed_attempts, 1)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+
+        geocode_deferred(['Новый'])
+        fetch.reset_mock()
+        self.assertEqual(resolve_pending_addresses(limit=1), 1)
+        fetch.assert_called_once()
+        self.assertEqual(fetch.call_args.kwargs['address'], 'Новый')
+
+        # Срок подошел - адрес запрашивается снова, пауза удваивается
+        later = failed.next_attempt_at + timedelta(seconds=1)
+        with patch('django.utils.timezone.now', return_value=later):
+            resolve_pending_addresses(limit=1)
+        failed.refresh_from_db()
+        self.assertEqual(failed.failed_attempts, 2)
+        self.assertEqual(failed.next_attempt_at, later + timedelta(minutes=2))
+
+
+class TestAddressAdmin(TestCase):
+
+    def test_other_spelling_of_known_address(self):
+        """Другое написание известного адреса - ошибка формы, а не 500."""
+        Address.objects.create(address='Москва, ул. Тверская, д. 1')
+        self.client.force_login(
+            get_user_model().objects.create(
+                username='admin', is_staff=True, is_superuser=True,
+            )
+        )
+        response = self.client.post(
+            reverse('admin:address_address_add'),
+            {
+                'address': 'москва  улица Тверская дом 1',
+                'status': Address.PENDING,
+                'failed_attempts': 0,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('address', response.context['adminform'].form.errors)
+        self.assertEqual(Address.objects.count(), 1)
+
+
+class TestNormalizeAddress(TestCase):
+
+    def test_normalize_address(self):
+        """Регистр, пунктуация, пробелы и сокращения не влияют на ключ."""
+        self.assertEqual(
+            normalize_address('Москва, ул. Новый Арбат, д. 1'),
+            normalize_address('москва  улица новый арбат дом 1'),
+        )
+        self.assertEqual(
+            normalize_address('Ростов-на-Дону, пр-т Ворошиловский, 2/1'),
+            'ростов-на-дону проспект ворошиловский 2 1',
+        )
+        self.assertEqual(normalize_address('Ёлкино, ул.Ёлочная'), 'елкино улица елочная')
@@ -1,42 +1,84 @@
+import threading
+import time
+
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def create_session(pool_size=10):
+    """Сессия с пулом соединений, переиспользуется между запросами."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+session = create_session()
+
 
+class RateLimiter:
+    """Ограничивает число запросов в секунду для всех потоков сразу."""
 
-def fetch_coordinates(address, yandex_token):
+    def __init__(self, qps):
+        self.interval = 1 / qps if qps else 0
+        self.next_call_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            call_at = max(now, self.next_call_at)
+            self.next_call_at = call_at + self.interval
+        time.sleep(call_at - now)
+
+
+def fetch_coordinates(address, yandex_token, http_session=None, rate_limiter=None):
     """
     Примнимает адрес и возращает lat и lon
     :param address: адрес, который нужно найти
     :param yandex_token: ваш токен для доступа к Yandex Geocode
+    :param http_session: сессия requests, по умолчанию общая для модуля
+    :param rate_limiter: RateLimiter, если нужно ограничить частоту запросов
     """
     params = {
         'geocode': address,
         'apikey': yandex_token,
         'format': 'json',
     }
-    response = requests.get(
-        url=settings.GEOCODE_URL,
-        params=params,
-    )
-    response.raise_for_status()
+    http_session = http_session or session
+    retries = settings.GEOCODE_RETRIES
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            rate_limiter.wait()
+        try:
+            response = http_session.get(
+                url=settings.GEOCODE_URL,
+                params=params,
+                timeout=settings.GEOCODE_TIMEOUT,
+            )
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                raise requests.HTTPError(response=response)
+            response.raise_for_status()
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as error:
+            retryable = (
+                not isinstance(error, requests.HTTPError)
+                or error.response.status_code in RETRY_STATUSES
+            )
+            if not retryable or attempt == retries:
+                raise
+            # Экспоненциальная задержка: 0.5, 1, 2... секунд
+            time.sleep(settings.GEOCODE_BACKOFF * 2 ** attempt)
     geoobject = response.json()['response'][
         'GeoObjectCollection'
     ]['featureMember']
     if not geoobject:
         return None
     return geoobject[0]['GeoObject']['Point']['pos'].split()
-
-def find_coordinates(address, coordinates):
-    """
-    Получаем широту и долготу адреса
-    Если нет совпадений в БД, то обращаемся к Geocode Api
-    :param address: адрес, который нужно найти
-    :param coordinates: словарь с адресом и координатами 
-    """
-    try:
-
-        return coordinates[address]
-    except KeyError:
-        return fetch_coordinates(
-            address=address,
-            yandex_token=settings.YANDEX_GEOCODE_API_KEY,
-        )
\ No newline at end of file
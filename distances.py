@@ -0,0 +1,78 @@
+import geopy.distance
+import numpy as np
+from django.conf import settings
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _as_points(points):
+    """Приводим список пар (широта, долгота) к массиву float.
+    Отсутствующие координаты (None) превращаются в NaN.
+    """
+    return np.array(
+        [point if point else (np.nan, np.nan) for point in points],
+        dtype=float,
+    ).reshape(-1, 2)
+
+
+def haversine_matrix(origins, destinations):
+    """
+    Матрица расстояний в км по формуле гаверсинусов
+    :param origins: список пар (широта, долгота), строки матрицы
+    :param destinations: список пар (широта, долгота), столбцы матрицы
+    """
+    origins = np.radians(_as_points(origins))
+    destinations = np.radians(_as_points(destinations))
+    origin_lat = origins[:, 0, np.newaxis]
+    origin_lon = origins[:, 1, np.newaxis]
+    destination_lat = destinations[np.newaxis, :, 0]
+    destination_lon = destinations[np.newaxis, :, 1]
+
+    a = (
+        np.sin((destination_lat - origin_lat) / 2) ** 2
+        + np.cos(origin_lat) * np.cos(destination_lat)
+        * np.sin((destination_lon - origin_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def geodesic_matrix(origins, destinations):
+    """
+    Матрица расстояний в км по эллипсоиду WGS-84, точнее гаверсинусов,
+    но считается поэлементно через geopy
+    :param origins: список пар (широта, долгота), строки матрицы
+    :param destinations: список пар (широта, долгота), столбцы матрицы
+    """
+    origins = _as_points(origins)
+    destinations = _as_points(destinations)
+    matrix = np.full((len(origins), len(destinations)), np.nan)
+    for row, origin in enumerate(origins):
+        if np.isnan(origin).any():
+            continue
+        for column, destination in enumerate(destinations):
+            if np.isnan(destination).any():
+                continue
+            matrix[row, column] = geopy.distance.geodesic(
+                origin,
+                destination,
+            ).km
+    return matrix
+
+
+DISTANCE_ENGINES = {
+    'haversine': haversine_matrix,
+    'geodesic': geodesic_matrix,
+}
+
+
+def distance_matrix(origins, destinations, mode=None):
+    """
+    Матрица расстояний origins x destinations в км.
+    Если у точки нет координат, в соответствующих ячейках будет NaN
+    :param origins: список пар (широта, долгота)
+    :param destinations: список пар (широта, долгота)
+    :param mode: haversine или geodesic, по умолчанию settings.DISTANCE_MODE
+    """
+    mode = mode or settings.DISTANCE_MODE
+    return DISTANCE_ENGINES[mode](origins, destinations)
@@ -0,0 +1,152 @@
+import gzip
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+_encoder = DjangoJSONEncoder()
+
+
+def default(obj):
+    # Decimal отдаем строкой, как DjangoJSONEncoder: цена не теряет копейки
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _encoder.default(obj)
+
+
+def orjson_dumps(data):
+    return orjson.dumps(
+        data,
+        default=default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def stdlib_dumps(data):
+    return json.dumps(
+        data,
+        default=default,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+
+
+# Компактный JSON в байтах: orjson, если установлен, иначе stdlib.
+# Результат одинаковый: Decimal и даты сериализуются как в DjangoJSONEncoder
+dumps = stdlib_dumps if orjson is None else orjson_dumps
+
+
+class JSONResponse(HttpResponse):
+    """Замена JsonResponse на общем сериализаторе."""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """Рендерер DRF на общем сериализаторе. Отступы - только
+    если клиент явно попросил их в Accept.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class NDJSONParser(parsers.BaseParser):
+    """Поток JSON-объектов по одному в строке. Возвращает список."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        items = []
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as error:
+                raise ParseError(f'NDJSON parse error in line {number}: {error}')
+        return items
+
+
+def get_encoding(accept_encoding):
+    """Лучшее из поддерживаемых сжатий, которое принимает клиент."""
+    accepted = set()
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        quality = params.replace(' ', '').lower()
+        if quality.startswith('q=') and not quality.strip('q=0.'):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+    return gzip.compress(content, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """
+    Сжимает JSON-ответы больше settings.JSON_COMPRESSION_MIN_BYTES
+    в br или gzip - что лучше из принимаемого клиентом.
+    ETag, как и в GZipMiddleware, становится слабым: тело меняется,
+    а If-None-Match сравнивает ETag без учета W/
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.JSON_COMPRESSION_MIN_BYTES
+        ):
+            return response
+
+        encoding = get_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        response.content = compress(response.content, encoding)
+        response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
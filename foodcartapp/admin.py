@@ -1,5 +1,13 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import EmptyResultSet, PermissionDenied
+from django.db import connections
 from django.shortcuts import reverse
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.templatetags.static import static
 from django.utils.html import format_html
 
@@ -9,6 +17,7 @@ from django.utils.http import url_has_allowed_host_and_scheme
 
 from .models import (Product, ProductCategory,
     Restaurant, RestaurantMenuItem, Order)
+from .renditions import get_rendition_url
 from django.db.models import Sum, F
 
 
@@ -19,6 +28,7 @@ class RestaurantMenuItemInline(admin.TabularInline):
 
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/foodcartapp/restaurant/change_list.html'
     search_fields = [
         'name',
         'address',
@@ -33,6 +43,54 @@ class RestaurantAdmin(admin.ModelAdmin):
         RestaurantMenuItemInline
     ]
 
+    def get_urls(self):
+        return [
+            path(
+                'availability/',
+                self.admin_site.admin_view(self.menu_availability_view),
+                name='foodcartapp_restaurant_availability',
+            ),
+        ] + super().get_urls()
+
+    def menu_availability_view(self, request):
+        """Таблица наличия продуктов по ресторанам. Изменения уходят
+        в /api/menu/availability/ одним запросом на включение
+        и одним на выключение.
+        """
+        if not request.user.has_perm('foodcartapp.change_restaurantmenuitem'):
+            raise PermissionDenied
+        categories = ProductCategory.objects.order_by('name')
+        category_id = request.GET.get('category', '')
+        products = Product.objects.order_by('name').values_list('id', 'name')
+        if category_id.isdigit():
+            category_id = int(category_id)
+            products = products.filter(category_id=category_id)
+        else:
+            category_id = None
+        restaurants = list(Restaurant.objects.order_by('name').values_list('id', 'name'))
+        availability = {
+            (product_id, restaurant_id): available
+            for product_id, restaurant_id, available in RestaurantMenuItem.objects.filter(
+                product_id__in=products.values('id'),
+            ).values_list('product_id', 'restaurant_id', 'availability')
+        }
+        rows = [
+            (product_id, name, [
+                (restaurant_id, availability.get((product_id, restaurant_id)))
+                for restaurant_id, _ in restaurants
+            ])
+            for product_id, name in products
+        ]
+        return TemplateResponse(request, 'admin/foodcartapp/restaurant/availability.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Наличие в меню',
+            'categories': categories,
+            'category_id': category_id,
+            'restaurants': restaurants,
+            'rows': rows,
+        })
+
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -93,14 +151,16 @@ class ProductAdmin(admin.ModelAdmin):
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        url = get_rendition_url(obj.image, width=300)
+        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=url)
     get_image_preview.short_description = 'превью'
 
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        src = get_rendition_url(obj.image, width=100)
+        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=src)
     get_image_list_preview.short_description = 'превью'
 
 
@@ -111,6 +171,88 @@ class ProductAdmin(admin.ModelAdmin):
 class ProductInstance(admin.TabularInline):
     model = Product.orders.through
 
+def get_estimated_count(queryset):
+    """
+    Число строк по оценке планировщика Postgres - без COUNT(*) по всей
+    выборке. Небольшие выборки и другие базы считаются точно
+    :return: (число строк, оценка ли это)
+    """
+    db_connection = connections[queryset.db]
+    if db_connection.vendor != 'postgresql':
+        return queryset.count(), False
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        # Выборка заведомо пуста, например .none() при поиске
+        return 0, False
+    with db_connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = plan[0]['Plan']['Plan Rows']
+    if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+        return queryset.count(), False
+    return estimate, True
+
+
+class CursorChangeList(ChangeList):
+    """
+    Список без OFFSET и COUNT(*): страницы листаются курсором по id
+    (новые сверху), число строк - оценка планировщика. Сортировка по
+    колонкам отключена - курсор работает только в порядке id
+    """
+    after_var = 'after'
+    before_var = 'before'
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(self.after_var, None)
+        lookup_params.pop(self.before_var, None)
+        return lookup_params
+
+    def get_results(self, request):
+        # Ссылки фильтров и поиска не должны уносить курсор
+        self.params.pop(self.after_var, None)
+        self.params.pop(self.before_var, None)
+        after = self.get_cursor(request, self.after_var)
+        before = self.get_cursor(request, self.before_var)
+
+        page_size = self.list_per_page
+        if before is not None:
+            rows = list(self.queryset.filter(pk__gt=before).order_by('pk')[:page_size + 1])
+            has_previous, has_next = len(rows) > page_size, True
+            rows = rows[:page_size][::-1]
+        else:
+            queryset = self.queryset.order_by('-pk')
+            if after is not None:
+                queryset = queryset.filter(pk__lt=after)
+            rows = list(queryset[:page_size + 1])
+            has_previous, has_next = after is not None, len(rows) > page_size
+            rows = rows[:page_size]
+
+        self.result_count, self.result_count_estimated = get_estimated_count(self.queryset)
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_previous or has_next
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, page_size)
+        self.previous_page_url = self.next_page_url = None
+        if rows and has_previous:
+            self.previous_page_url = self.get_query_string({self.before_var: rows[0].pk})
+        if rows and has_next:
+            self.next_page_url = self.get_query_string({self.after_var: rows[-1].pk})
+
+    @staticmethod
+    def get_cursor(request, name):
+        try:
+            return int(request.GET[name])
+        except (KeyError, ValueError):
+            return None
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     readonly_fields = ('registrated_at',)
@@ -126,8 +268,39 @@ class OrderAdmin(admin.ModelAdmin):
         'called_at',
         'delivered_at',
         'payment',
+        'cooking_restaurant',
+    )
+    list_select_related = ('cooking_restaurant',)
+    list_filter = (
+        'status',
+        'payment',
+        ('registrated_at', admin.DateFieldListFilter),
+        ('cooking_restaurant', admin.EmptyFieldListFilter),
     )
+    # Поиск - только по индексам: номер заказа или телефон в любом написании
+    search_fields = ('id', 'contact_phone_e164')
+    list_per_page = 100
+    show_full_result_count = False
+    sortable_by = ()
+    ordering = ('-id',)
     inlines = (ProductInstance,)
+    actions = ('assign_cooking_restaurants',)
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit() and len(search_term) <= 9:
+            return queryset.filter(id=int(search_term)), False
+        return queryset.filter_by_phone(search_term), False
+
+    @admin.action(description='Назначить рестораны заказам без ресторана')
+    def assign_cooking_restaurants(self, request, queryset):
+        assignment = queryset.assign_cooking_restaurants()
+        self.message_user(request, f'Назначено заказов: {len(assignment)}')
 
     def response_change(self, request, obj):
         response = super(OrderAdmin, self).response_change(request, obj)
@@ -0,0 +1,125 @@
+from collections import Counter
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+# Расстояние для ресторанов и заказов без координат: такие варианты
+# выбираются, только если других нет
+UNKNOWN_DISTANCE_KM = 100
+INFEASIBLE_COST = 1e9
+
+
+def get_cost(distance_km, load, load_penalty_km):
+    """Стоимость назначения: расстояние плюс штраф за каждый заказ,
+    который ресторан уже готовит.
+    """
+    if distance_km is None:
+        distance_km = UNKNOWN_DISTANCE_KM
+    return float(distance_km) + load_penalty_km * load
+
+
+def assign_greedy(candidates, load, load_penalty_km, max_load=None):
+    """
+    Заказы разбираются по очереди, каждому достается самый дешевый
+    ресторан с учетом уже назначенных в этом же проходе заказов
+    :param candidates: словарь id заказа - список пар (id ресторана, км),
+        заказы в порядке очереди, рестораны от ближнего к дальнему
+    :param load: словарь id ресторана - число заказов в работе
+    :param load_penalty_km: во сколько км обходится один заказ в работе
+    :param max_load: больше этого числа заказов ресторану не назначаем
+    :return: словарь id заказа - id ресторана
+    """
+    load = Counter(load)
+    assignment = {}
+    for order_id, restaurants in candidates.items():
+        best_cost = best_restaurant_id = None
+        for restaurant_id, distance_km in restaurants:
+            # Рестораны отсортированы по расстоянию, а штраф не бывает
+            # отрицательным - дальше дешевле уже не будет
+            if best_cost is not None and get_cost(distance_km, 0, 0) >= best_cost:
+                break
+            if max_load is not None and load[restaurant_id] >= max_load:
+                continue
+            cost = get_cost(distance_km, load[restaurant_id], load_penalty_km)
+            if best_cost is None or cost < best_cost:
+                best_cost, best_restaurant_id = cost, restaurant_id
+        if best_restaurant_id is not None:
+            assignment[order_id] = best_restaurant_id
+            load[best_restaurant_id] += 1
+    return assignment
+
+
+def assign_min_cost(
+        candidates, load, load_penalty_km,
+        max_load=None, batch_size=200):
+    """
+    Назначение минимальной суммарной стоимости. Каждый ресторан
+    раскладывается на «места»: k-е место стоит k заказов штрафа, так что
+    растущая загрузка учитывается точно. Заказы решаются пачками по
+    batch_size, загрузка переносится из пачки в пачку
+    :param candidates: как в assign_greedy
+    :return: словарь id заказа - id ресторана
+    """
+    if linear_sum_assignment is None:
+        raise ImportError('Для назначения min-cost нужен пакет scipy')
+
+    load = Counter(load)
+    order_ids = list(candidates)
+    assignment = {}
+    for start in range(0, len(order_ids), batch_size):
+        batch = order_ids[start:start + batch_size]
+        demand = Counter(
+            restaurant_id
+            for order_id in batch
+            for restaurant_id, _ in candidates[order_id]
+        )
+        columns = {}
+        slots = []
+        for restaurant_id, orders_count in demand.items():
+            free_slots = orders_count
+            if max_load is not None:
+                free_slots = min(free_slots, max_load - load[restaurant_id])
+            if free_slots <= 0:
+                continue
+            columns[restaurant_id] = len(slots)
+            slots.extend(
+                (restaurant_id, load[restaurant_id] + slot)
+                for slot in range(free_slots)
+            )
+        if not slots:
+            continue
+
+        costs = np.full((len(batch), len(slots)), INFEASIBLE_COST)
+        for row, order_id in enumerate(batch):
+            for restaurant_id, distance_km in candidates[order_id]:
+                first_column = columns.get(restaurant_id)
+                if first_column is None:
+                    continue
+                column = first_column
+                while column < len(slots) and slots[column][0] == restaurant_id:
+                    costs[row, column] = get_cost(
+                        distance_km,
+                        slots[column][1],
+                        load_penalty_km,
+                    )
+                    column += 1
+
+        rows, matched_columns = linear_sum_assignment(costs)
+        for row, column in zip(rows, matched_columns):
+            if costs[row, column] >= INFEASIBLE_COST:
+                continue
+            restaurant_id = slots[column][0]
+            assignment[batch[row]] = restaurant_id
+            load[restaurant_id] += 1
+    return assignment
+
+
+STRATEGIES = {
+    'greedy': assign_greedy,
+    'min-cost': assign_min_cost,
+}
@@ -0,0 +1,53 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from fast_json import dumps
+
+
+CATALOG_CACHE_KEY = 'product-catalog'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def get_catalog(load_products, version):
+    """
+    Каталог продуктов, сериализованный в JSON один раз на все запросы
+    с одной версией данных
+    :param load_products: функция, возвращающая список продуктов для JSON
+    :param version: отпечаток данных каталога в базе, читается до выборки
+    :return: словарь с content (байты JSON), etag и last_modified
+    """
+    cache_key = make_cache_key(CATALOG_CACHE_KEY, version)
+    catalog = cache.get(cache_key)
+    if catalog is None:
+        content = dumps(load_products())
+        catalog = {
+            'content': content,
+            'etag': hashlib.sha256(content).hexdigest(),
+            'last_modified': timezone.now().replace(microsecond=0),
+        }
+        cache.set(cache_key, catalog, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return catalog
+
+
+def make_cache_key(prefix, version):
+    """Ключ кэша для версии данных: любое изменение версии дает новый ключ."""
+    return f'{prefix}-{hashlib.sha256(repr(version).encode()).hexdigest()}'
+
+
+def make_cursor(moment):
+    """Курсор синхронизации - микросекунды от начала эпохи."""
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def parse_cursor(cursor):
+    """
+    :raises ValueError: курсор не число или вне допустимых дат
+    """
+    try:
+        return EPOCH + timedelta(microseconds=int(cursor))
+    except OverflowError as error:
+        raise ValueError(cursor) from error
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import STRATEGIES
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Назначает готовящие рестораны всем невыполненным заказам без ресторана'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategy', choices=list(STRATEGIES))
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать назначения, ничего не сохраняя',
+        )
+
+    def handle(self, *args, **options):
+        assignment = Order.objects.assign_cooking_restaurants(
+            strategy=options['strategy'],
+            dry_run=options['dry_run'],
+        )
+        if options['verbosity'] > 1:
+            for order_id, restaurant_id in assignment.items():
+                self.stdout.write(f'заказ {order_id} -> ресторан {restaurant_id}')
+        prefix = 'Будет назначено' if options['dry_run'] else 'Назначено'
+        self.stdout.write(f'{prefix} заказов: {len(assignment)}')
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from address.geocoder import cache, geocode_many
+from foodcartapp.models import (GEOCODE_FAILED, GEOCODE_PENDING,
+                                GEOCODE_RESOLVED, Order, OrderCandidate,
+                                Restaurant)
+from foodcartapp.spatial import invalidate_restaurant_index
+
+
+class Command(BaseCommand):
+    help = 'Заполняет координаты ресторанов и заказов, у которых их еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Число потоков для запросов к геокодеру',
+        )
+        parser.add_argument(
+            '--qps',
+            type=float,
+            help='Ограничение запросов к геокодеру в секунду',
+        )
+
+    def handle(self, *args, **options):
+        for model in (Restaurant, Order):
+            resolved, total = self.backfill(model, options)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'координаты найдены для {resolved} из {total}'
+            )
+        self.stdout.write(f'кэш геокодера: {cache.stats()}')
+
+    def backfill(self, model, options):
+        places = model.objects.filter(
+            geocode_status__in=[GEOCODE_PENDING, GEOCODE_FAILED],
+        ).only('id', 'address')
+
+        resolved = total = 0
+        batch = []
+        for place in places.iterator(chunk_size=options['batch_size']):
+            batch.append(place)
+            if len(batch) >= options['batch_size']:
+                resolved += self.geocode_batch(model, batch, options)
+                total += len(batch)
+                batch = []
+        if batch:
+            resolved += self.geocode_batch(model, batch, options)
+            total += len(batch)
+        return resolved, total
+
+    @staticmethod
+    def geocode_batch(model, places, options):
+        """Геокодируем пачку записей и сохраняем одним bulk_update."""
+        coordinates = geocode_many(
+            [place.address for place in places],
+            workers=options['workers'],
+            qps=options['qps'],
+        )
+        for place in places:
+            if place.address and place.address not in coordinates:
+                place.geocode_status = GEOCODE_FAILED
+                continue
+            place.set_coordinates(coordinates.get(place.address))
+        fields = ['latitude', 'longitude', 'geocode_status']
+        if model is Restaurant:
+            # bulk_update не трогает auto_now, а по updated_at
+            # другие процессы узнают, что индекс ресторанов устарел
+            now = timezone.now()
+            for place in places:
+                place.updated_at = now
+            fields.append('updated_at')
+        model.objects.bulk_update(places, fields=fields)
+        if model is Restaurant and places:
+            invalidate_restaurant_index()
+            for restaurant in places:
+                OrderCandidate.objects.refresh_restaurant(restaurant.id)
+        elif places:
+            OrderCandidate.objects.refresh_orders([order.id for order in places])
+        return sum(place.geocode_status == GEOCODE_RESOLVED for place in places)
@@ -0,0 +1,57 @@
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+import fast_json
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает размер и время сериализации JSON-ответа каталога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--runs', type=int, default=200)
+
+    def handle(self, *args, **options):
+        payload = [
+            {
+                'id': number,
+                'name': f'Бургер {number}',
+                'price': Decimal('349.90'),
+                'special_status': number % 5 == 0,
+                'description': 'Сочная котлета, сыр чеддер, соус и свежие овощи. ' * 3,
+                'category': {'id': number % 4, 'name': 'Бургеры'},
+                'image': f'/media/burger-{number}.jpg',
+                'restaurant': {'id': number, 'name': f'Бургер {number}'},
+            }
+            for number in range(options['products'])
+        ]
+        variants = {
+            'json indent=4': lambda data: json.dumps(
+                data,
+                cls=DjangoJSONEncoder,
+                ensure_ascii=False,
+                indent=4,
+            ).encode(),
+            'fast_json stdlib': fast_json.stdlib_dumps,
+        }
+        if fast_json.orjson is not None:
+            variants['fast_json orjson'] = fast_json.orjson_dumps
+
+        encodings = ['gzip'] + (['br'] if fast_json.brotli else [])
+        for name, dumps in variants.items():
+            content = dumps(payload)
+            started_at = time.perf_counter()
+            for _ in range(options['runs']):
+                dumps(payload)
+            elapsed = (time.perf_counter() - started_at) / options['runs']
+            sizes = ', '.join(
+                f'{encoding} {len(fast_json.compress(content, encoding))}'
+                for encoding in encodings
+            )
+            self.stdout.write(
+                f'{name}: {elapsed * 1e6:.0f} мкс, {len(content)} байт ({sizes})'
+            )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order
+from foodcartapp.spool import OrderSpool
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит заказы из очереди приема в базу пачками. '
+        'После перезапуска продолжает с первой неперенесенной записи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Перенести очередь один раз и выйти',
+        )
+
+    def handle(self, *args, **options):
+        spool = OrderSpool()
+        while True:
+            entries = spool.read(options['batch_size'])
+            if entries:
+                created_ids = Order.objects.create_from_spool(spool.spool_id, entries)
+                # Записи удаляем только после коммита в базу: если упадем
+                # между коммитом и удалением, повтор их пропустит
+                # по (spool_id, spool_offset)
+                spool.trim(entries[-1][0])
+                self.stdout.write(
+                    f'записей: {len(entries)}, создано заказов: {len(created_ids)}'
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
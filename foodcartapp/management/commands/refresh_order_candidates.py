@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order, OrderCandidate
+
+
+class Command(BaseCommand):
+    help = 'Заново заполняет таблицу ресторанов для всех невыполненных заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        order_ids = list(
+            Order.objects.get_not_complete_orders()
+                         .order_by('id')
+                         .values_list('id', flat=True)
+        )
+        batch_size = options['batch_size']
+        for start in range(0, len(order_ids), batch_size):
+            OrderCandidate.objects.refresh_orders(
+                order_ids[start:start + batch_size],
+            )
+        OrderCandidate.objects.exclude(
+            order__in=Order.objects.get_not_complete_orders(),
+        ).delete()
+        self.stdout.write(f'Пересчитано заказов: {len(order_ids)}')
@@ -0,0 +1,91 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from address.geocoder import geocode_deferred, resolve_pending_addresses
+from foodcartapp.models import (GEOCODE_PENDING, Order, OrderCandidate,
+                                Restaurant)
+from foodcartapp.spatial import invalidate_restaurant_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Фоновый геокодер: разбирает очередь адресов и проставляет '
+        'координаты ресторанам и заказам, которые их ждут'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь один раз и выйти',
+        )
+        parser.add_argument('--workers', type=int)
+        parser.add_argument('--qps', type=float)
+
+    def handle(self, *args, **options):
+        while True:
+            resolved = resolve_pending_addresses(
+                limit=options['batch_size'],
+                workers=options['workers'],
+                qps=options['qps'],
+            )
+            updated = sum(
+                self.update_places(model, options['batch_size'])
+                for model in (Restaurant, Order)
+            )
+            if resolved or updated:
+                self.stdout.write(
+                    f'адресов обработано: {resolved}, записей обновлено: {updated}'
+                )
+            if options['once']:
+                break
+            if not resolved and not updated:
+                time.sleep(options['interval'])
+
+    def update_places(self, model, batch_size):
+        """Переносим найденные координаты в записи, которые их ждут."""
+        places = model.objects.filter(geocode_status=GEOCODE_PENDING) \
+                              .only('id', 'address')
+        updated = 0
+        batch = []
+        for place in places.iterator(chunk_size=batch_size):
+            batch.append(place)
+            if len(batch) >= batch_size:
+                updated += self.update_batch(model, batch)
+                batch = []
+        return updated + self.update_batch(model, batch)
+
+    @staticmethod
+    def update_batch(model, places):
+        coordinates = geocode_deferred([place.address for place in places])
+        updated_places = []
+        for place in places:
+            if place.address and place.address not in coordinates:
+                continue
+            place.set_coordinates(coordinates.get(place.address))
+            updated_places.append(place)
+        fields = ['latitude', 'longitude', 'geocode_status']
+        if model is Restaurant:
+            # bulk_update не трогает auto_now, а по updated_at
+            # другие процессы узнают, что индекс ресторанов устарел
+            now = timezone.now()
+            for place in updated_places:
+                place.updated_at = now
+            fields.append('updated_at')
+        model.objects.bulk_update(updated_places, fields=fields)
+        if model is Restaurant and updated_places:
+            invalidate_restaurant_index()
+            for restaurant in updated_places:
+                OrderCandidate.objects.refresh_restaurant(restaurant.id)
+        elif updated_places:
+            OrderCandidate.objects.refresh_orders([order.id for order in updated_places])
+        return len(updated_places)
@@ -0,0 +1,66 @@
+from functools import reduce
+from operator import and_
+
+
+class RestaurantAvailabilityIndex:
+    """Обратный индекс: id продукта - битовая маска ресторанов,
+    у которых этот продукт сейчас в продаже.
+    Номер бита - позиция ресторана в restaurant_ids.
+    """
+
+    def __init__(self, menu_items):
+        """
+        :param menu_items: пары (id продукта, id ресторана)
+        """
+        self.restaurant_ids = []
+        self.positions = {}
+        self.bitsets = {}
+        for product_id, restaurant_id in menu_items:
+            position = self.positions.get(restaurant_id)
+            if position is None:
+                position = len(self.restaurant_ids)
+                self.positions[restaurant_id] = position
+                self.restaurant_ids.append(restaurant_id)
+            self.bitsets[product_id] = self.bitsets.get(product_id, 0) | 1 << position
+
+    def get_bitset(self, product_ids):
+        """Маска ресторанов, способных приготовить все продукты сразу."""
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        return reduce(
+            and_,
+            (self.bitsets.get(product_id, 0) for product_id in product_ids),
+        )
+
+    def get_mask(self, restaurant_ids):
+        """Маска, в которой отмечены только переданные рестораны."""
+        mask = 0
+        for restaurant_id in restaurant_ids:
+            position = self.positions.get(restaurant_id)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def get_positions(self, product_ids, restaurant_ids=None):
+        """Позиции ресторанов, способных приготовить все продукты сразу
+        :param restaurant_ids: если указаны, ищем только среди них.
+        """
+        bitset = self.get_bitset(product_ids)
+        if restaurant_ids is not None:
+            bitset &= self.get_mask(restaurant_ids)
+        positions = []
+        while bitset:
+            lowest_bit = bitset & -bitset
+            positions.append(lowest_bit.bit_length() - 1)
+            bitset ^= lowest_bit
+        return positions
+
+    def find_restaurants(self, product_ids, restaurant_ids=None):
+        """id ресторанов, способных приготовить все продукты сразу
+        :param restaurant_ids: если указаны, ищем только среди них.
+        """
+        return [
+            self.restaurant_ids[position]
+            for position in self.get_positions(product_ids, restaurant_ids)
+        ]
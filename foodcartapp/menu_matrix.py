@@ -0,0 +1,68 @@
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog import make_cache_key
+
+
+MENU_MATRIX_CACHE_KEY = 'menu-availability-matrix'
+
+
+class AvailabilityMatrix:
+    """Наличие продуктов в ресторанах: строка - продукт, столбец -
+    ресторан, в ячейке True, если продукт есть в меню и в продаже.
+    Миллион ячеек занимает мегабайт, а не миллион объектов.
+    """
+
+    def __init__(self, product_ids, restaurant_ids, menu_items):
+        """
+        :param product_ids: id продуктов в порядке строк
+        :param restaurant_ids: id ресторанов в порядке столбцов
+        :param menu_items: пары (id продукта, id ресторана) для продуктов
+            в продаже, остальные ячейки - False
+        """
+        self.product_ids = list(product_ids)
+        self.restaurant_ids = list(restaurant_ids)
+        self.cells = np.zeros(
+            (len(self.product_ids), len(self.restaurant_ids)),
+            dtype=bool,
+        )
+        items = np.fromiter(
+            chain.from_iterable(menu_items),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        rows = self.get_positions(self.product_ids, items[:, 0])
+        columns = self.get_positions(self.restaurant_ids, items[:, 1])
+        # Пункты меню продуктов и ресторанов вне матрицы пропускаем
+        known = (rows >= 0) & (columns >= 0)
+        self.cells[rows[known], columns[known]] = True
+
+    @staticmethod
+    def get_positions(ids, values):
+        """Позиции values в ids, -1 для отсутствующих."""
+        ids = np.array(ids, dtype=np.int64)
+        if not len(ids):
+            return np.full(len(values), -1)
+        order = np.argsort(ids)
+        sorted_positions = np.searchsorted(ids[order], values).clip(max=len(ids) - 1)
+        positions = order[sorted_positions]
+        return np.where(ids[positions] == values, positions, -1)
+
+
+def get_menu_matrix(load_menu, version):
+    """
+    Матрица наличия и данные для ее вывода. Собирается одним проходом
+    по меню и лежит в кэше, пока не изменится version
+    :param load_menu: функция, возвращающая словарь с products
+        и restaurants - списками строк таблицы - и matrix
+    :param version: отпечаток продуктов, ресторанов и меню в базе,
+        читается до выборки
+    """
+    cache_key = make_cache_key(MENU_MATRIX_CACHE_KEY, version)
+    menu = cache.get(cache_key)
+    if menu is None:
+        menu = load_menu()
+        cache.set(cache_key, menu, timeout=settings.MENU_MATRIX_CACHE_TIMEOUT)
+    return menu
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0058_auto_20240313_1230'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='geocode_status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Не обработан'), (2, 'Координаты найдены'), (3, 'Адрес не найден'), (4, 'Ошибка геокодера')], db_index=True, default=1, verbose_name='Статус геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MaxValueValidator(90), django.core.validators.MinValueValidator(-90)], verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MaxValueValidator(180), django.core.validators.MinValueValidator(-180)], verbose_name='Долгота'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='geocode_status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Не обработан'), (2, 'Координаты найдены'), (3, 'Адрес не найден'), (4, 'Ошибка геокодера')], db_index=True, default=1, verbose_name='Статус геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MaxValueValidator(90), django.core.validators.MinValueValidator(-90)], verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MaxValueValidator(180), django.core.validators.MinValueValidator(-180)], verbose_name='Долгота'),
+        ),
+    ]
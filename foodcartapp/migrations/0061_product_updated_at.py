@@ -0,0 +1,35 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_ordercandidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.PositiveIntegerField(verbose_name='id продукта')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='удален')),
+            ],
+            options={
+                'verbose_name': 'удаленный товар',
+                'verbose_name_plural': 'удаленные товары',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='изменен'),
+        ),
+        migrations.AddField(
+            model_name='restaurantmenuitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='изменен'),
+        ),
+    ]
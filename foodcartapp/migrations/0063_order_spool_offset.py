@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0062_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='spool_offset',
+            field=models.PositiveBigIntegerField(editable=False, null=True, unique=True, verbose_name='Номер в очереди приема заказов'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:36
+
+from django.db import migrations, models
+import foodcartapp.phones
+import phonenumbers
+from django.conf import settings
+
+
+BATCH_SIZE = 1000
+
+
+def fill_contact_phone_e164(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    orders = Order.objects.only('id', 'contact_phone')
+    changed_orders = []
+    for order in orders.iterator(chunk_size=BATCH_SIZE):
+        try:
+            phone = phonenumbers.parse(
+                str(order.contact_phone),
+                settings.PHONENUMBER_DEFAULT_REGION,
+            )
+        except phonenumbers.NumberParseException:
+            continue
+        if phonenumbers.is_valid_number(phone):
+            order.contact_phone_e164 = phonenumbers.format_number(
+                phone,
+                phonenumbers.PhoneNumberFormat.E164,
+            )
+            changed_orders.append(order)
+        if len(changed_orders) == BATCH_SIZE:
+            Order.objects.bulk_update(changed_orders, ['contact_phone_e164'])
+            changed_orders = []
+    Order.objects.bulk_update(
+        changed_orders,
+        ['contact_phone_e164'],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0063_order_spool_offset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='contact_phone_e164',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='Телефон в формате E.164'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='contact_phone',
+            field=foodcartapp.phones.PhoneNumberField(e164_field='contact_phone_e164', max_length=128, region=None, verbose_name='Нормализированный номер телефона'),
+        ),
+        migrations.AlterField(
+            model_name='restaurant',
+            name='contact_phone',
+            field=foodcartapp.phones.PhoneNumberField(blank=True, max_length=128, region=None, verbose_name='Нормализированный номер телефона'),
+        ),
+        migrations.RunPython(
+            fill_contact_phone_e164,
+            migrations.RunPython.noop,
+        ),
+    ]
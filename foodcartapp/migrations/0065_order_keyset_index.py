@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0064_order_contact_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'registrated_at', 'id'], name='foodcartapp_status_5d1486_idx'),
+        ),
+    ]
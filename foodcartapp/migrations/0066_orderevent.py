@@ -0,0 +1,26 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0065_order_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.PositiveIntegerField(verbose_name='id заказа')),
+                ('kind', models.CharField(choices=[('created', 'Создан'), ('updated', 'Изменен'), ('status', 'Сменил статус'), ('deleted', 'Удален')], max_length=10, verbose_name='событие')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='время события')),
+            ],
+            options={
+                'verbose_name': 'событие заказа',
+                'verbose_name_plural': 'события заказов',
+            },
+        ),
+    ]
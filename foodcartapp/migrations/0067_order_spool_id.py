@@ -0,0 +1,27 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0066_orderevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='spool_id',
+            field=models.UUIDField(editable=False, null=True, verbose_name='Файл очереди приема заказов'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='spool_offset',
+            field=models.PositiveBigIntegerField(editable=False, null=True, verbose_name='Номер в очереди приема заказов'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('spool_id', 'spool_offset'), name='unique_order_spool_entry'),
+        ),
+    ]
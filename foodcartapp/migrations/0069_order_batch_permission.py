@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0068_restaurant_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='order',
+            options={'permissions': [('create_order_batch', 'Может загружать заказы пакетами')], 'verbose_name': 'заказ', 'verbose_name_plural': 'заказы'},
+        ),
+    ]
@@ -1,13 +1,136 @@
-from django.db import models
-from django.core.validators import MinValueValidator
-from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models import Sum, F
-from functools import reduce
-from coordinates import find_coordinates
-import geopy.distance
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Sum
+from django.db.models.functions import Cast
+from decimal import Decimal
+from math import isnan
 
+from address.geocoder import geocode_deferred, geocode_many
+from distances import distance_matrix
+from .assignment import STRATEGIES
+from .renditions import delete_renditions, get_renditions
+from .matching import RestaurantAvailabilityIndex
+from .phones import PhoneNumberField, get_e164
+from .spatial import get_restaurant_index, invalidate_restaurant_index
 
-class Restaurant(models.Model):
+
+GEOCODE_PENDING = 1
+GEOCODE_RESOLVED = 2
+GEOCODE_NOT_FOUND = 3
+GEOCODE_FAILED = 4
+GEOCODE_STATUSES = (
+    (GEOCODE_PENDING, 'Не обработан'),
+    (GEOCODE_RESOLVED, 'Координаты найдены'),
+    (GEOCODE_NOT_FOUND, 'Адрес не найден'),
+    (GEOCODE_FAILED, 'Ошибка геокодера'),
+)
+
+
+class VersionedQuerySet(models.QuerySet):
+    def get_version(self):
+        """Отпечаток таблицы для ключей кэша: число строк и последнее
+        изменение. Удаление меняет число строк, создание и правка - updated_at.
+        Читается из базы, поэтому одинаков во всех процессах.
+        """
+        return tuple(self.aggregate(Count('id'), Max('updated_at')).values())
+
+
+class GeocodedModel(models.Model):
+    """Модель с адресом, координаты которого сохраняются при записи."""
+    latitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        verbose_name='Широта',
+        null=True,
+        blank=True,
+        validators=[
+            MaxValueValidator(90),
+            MinValueValidator(-90),
+        ]
+    )
+    longitude = models.DecimalField(
+        max_digits=9,
+        decimal_places=6,
+        verbose_name='Долгота',
+        null=True,
+        blank=True,
+        validators=[
+            MaxValueValidator(180),
+            MinValueValidator(-180),
+        ]
+    )
+    geocode_status = models.PositiveSmallIntegerField(
+        choices=GEOCODE_STATUSES,
+        default=GEOCODE_PENDING,
+        verbose_name='Статус геокодирования',
+        db_index=True,
+    )
+
+    class Meta:
+        abstract = True
+
+    @property
+    def coordinates(self):
+        """Широта и долгота в виде float или None, если их нет."""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return float(self.latitude), float(self.longitude)
+
+    def set_coordinates(self, coordinates):
+        """Записываем результат геокодирования, без сохранения в БД
+        :param coordinates: (широта, долгота), None - адрес не найден.
+        """
+        if not coordinates:
+            self.latitude, self.longitude = None, None
+            self.geocode_status = GEOCODE_NOT_FOUND
+            return
+        self.latitude, self.longitude = coordinates
+        self.geocode_status = GEOCODE_RESOLVED
+
+    def fill_coordinates(self, wait=False):
+        """Заполняем координаты по адресу, без сохранения в БД.
+        По умолчанию берем только известные координаты, а новый адрес
+        ставим в очередь фонового геокодера и оставляем статус «не обработан»
+        :param wait: дождаться ответа Geocode Api, если адрес неизвестен.
+        """
+        self.latitude, self.longitude = None, None
+        if not self.address:
+            self.set_coordinates(None)
+            return
+        if not wait:
+            coordinates = geocode_deferred([self.address])
+            self.geocode_status = GEOCODE_PENDING
+        else:
+            coordinates = geocode_many([self.address], workers=1)
+            self.geocode_status = GEOCODE_FAILED
+        if self.address in coordinates:
+            self.set_coordinates(coordinates[self.address])
+
+
+class RestaurantQuerySet(VersionedQuerySet):
+    def get_spatial_index(self):
+        """Индекс ресторанов по координатам, общий для запросов процесса.
+        Версия индекса - число ресторанов, последний id и последнее
+        изменение: одна агрегация по индексам вместо выборки всех строк.
+        """
+        version = self.aggregate(
+            restaurants_count=Count('id'),
+            last_id=Max('id'),
+            last_updated_at=Max('updated_at'),
+        )
+        return get_restaurant_index(
+            lambda: self.values_list('id', 'latitude', 'longitude'),
+            version=tuple(version.values()),
+        )
+
+
+class Restaurant(GeocodedModel):
     name = models.CharField(
         verbose_name='название',
         max_length=64,
@@ -21,6 +144,16 @@ class Restaurant(models.Model):
         verbose_name='Нормализированный номер телефона',
         blank=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='изменен',
+        auto_now=True,
+        db_index=True,
+    )
+    objects = RestaurantQuerySet.as_manager()
+
+    # Координаты, прочитанные из базы: по ним post_save решает,
+    # пересчитывать ли кандидатов ресторана
+    saved_coordinates = None
 
     class Meta:
         verbose_name = 'ресторан'
@@ -29,8 +162,15 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        restaurant = super().from_db(db, field_names, values)
+        if {'latitude', 'longitude'} <= restaurant.__dict__.keys():
+            restaurant.saved_coordinates = restaurant.coordinates
+        return restaurant
+
 
-class ProductQuerySet(models.QuerySet):
+class ProductQuerySet(VersionedQuerySet):
     def available(self):
         products = (
             RestaurantMenuItem.objects
@@ -39,6 +179,30 @@ class ProductQuerySet(models.QuerySet):
         )
         return self.filter(pk__in=products)
 
+    def changed_since(self, since):
+        """Продукты, у которых после since менялись данные
+        или наличие в меню ресторанов.
+        """
+        changed_menu_items = (
+            RestaurantMenuItem.objects
+            .filter(updated_at__gt=since)
+            .values_list('product')
+        )
+        return self.filter(
+            Q(updated_at__gt=since) | Q(pk__in=changed_menu_items)
+        )
+
+    def with_availability(self):
+        """Добавляем признак is_available: продукт есть в продаже."""
+        return self.annotate(
+            is_available=Exists(
+                RestaurantMenuItem.objects.filter(
+                    product=OuterRef('pk'),
+                    availability=True,
+                )
+            )
+        )
+
 
 class ProductCategory(models.Model):
     name = models.CharField(
@@ -89,6 +253,11 @@ class Product(models.Model):
         'Order',
         through='OrderProduct',
     )
+    updated_at = models.DateTimeField(
+        verbose_name='изменен',
+        auto_now=True,
+        db_index=True,
+    )
     objects = ProductQuerySet.as_manager()
 
     class Meta:
@@ -99,11 +268,69 @@ class Product(models.Model):
         return self.name
 
 
-class RestaurantMenuItemQuerySet(models.QuerySet):
-    def get_restaurants_with_products(self):
-        return self.annotate(restaurant_name=F('restaurant__name')) \
-                   .annotate(product_name=F('product__name')) \
-                   .annotate(restaurant_address=F('restaurant__address'))
+class ProductTombstone(models.Model):
+    """Удаленный продукт: по нему клиенты с ?since= узнают об удалении."""
+    product_id = models.PositiveIntegerField(
+        verbose_name='id продукта',
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name='удален',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'удаленный товар'
+        verbose_name_plural = 'удаленные товары'
+
+
+class RestaurantMenuItemQuerySet(VersionedQuerySet):
+    def get_availability_index(self):
+        """Строим индекс продукт - рестораны одним запросом."""
+        return RestaurantAvailabilityIndex(
+            self.filter(availability=True)
+                .values_list('product_id', 'restaurant_id')
+        )
+
+    def filter_pairs(self, pairs):
+        """Пункты меню по парам (id ресторана, id продукта)."""
+        products_by_restaurant = {}
+        for restaurant_id, product_id in pairs:
+            products_by_restaurant.setdefault(restaurant_id, set()).add(product_id)
+        condition = Q()
+        for restaurant_id, product_ids in products_by_restaurant.items():
+            condition |= Q(restaurant_id=restaurant_id, product_id__in=product_ids)
+        return self.filter(condition) if condition else self.none()
+
+    def set_availability(self, availability):
+        """Меняем наличие одним UPDATE ... WHERE. Сигналы пунктов меню
+        не отправляются, вместо них - одно menu_availability_changed
+        на все изменение
+        :return: сколько пунктов меню изменилось.
+        """
+        with transaction.atomic():
+            # Блокируем строки до UPDATE: параллельное переключение не
+            # изменит набор пунктов между выборкой и записью
+            changed_items = list(
+                self.exclude(availability=availability)
+                    .select_for_update()
+                    .values_list('id', 'restaurant_id', 'product_id')
+            )
+            restaurant_ids = {restaurant_id for _, restaurant_id, _ in changed_items}
+            product_ids = {product_id for _, _, product_id in changed_items}
+            updated = RestaurantMenuItem.objects.filter(
+                id__in=[item_id for item_id, _, _ in changed_items],
+            ).update(
+                availability=availability,
+                updated_at=timezone.now(),
+            )
+            if updated:
+                menu_availability_changed.send(
+                    sender=RestaurantMenuItem,
+                    restaurant_ids=restaurant_ids,
+                    product_ids=product_ids,
+                )
+        return updated
 
 
 class RestaurantMenuItem(models.Model):
@@ -124,6 +351,11 @@ class RestaurantMenuItem(models.Model):
         default=True,
         db_index=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='изменен',
+        auto_now=True,
+        db_index=True,
+    )
     objects = RestaurantMenuItemQuerySet.as_manager()
 
     class Meta:
@@ -155,9 +387,208 @@ class OrderQuerySet(models.QuerySet):
         """Добавляем поле с названием готовящего ресторана."""
         return self.annotate(restaurant_name=F('cooking_restaurant__name'))
 
+    def create_batch(self, orders_data):
+        """Создаем проверенные заказы пачкой в одной транзакции:
+        один bulk_create для заказов и один для их продуктов
+        :param orders_data: validated_data из OrderSerializer
+        :return: созданные заказы в том же порядке.
+        """
+        with transaction.atomic():
+            coordinates = geocode_deferred(
+                [order_data['address'] for order_data in orders_data]
+            )
+            orders = []
+            order_products = []
+            for order_data in orders_data:
+                order_data = dict(order_data)
+                products = [
+                    OrderProduct(
+                        product=product_data['product'],
+                        amount=product_data['amount'],
+                        product_price=product_data['product'].price,
+                    ) for product_data in order_data.pop('products')
+                ]
+                order = Order(
+                    **order_data,
+                    total_price=sum(
+                        product.amount * product.product_price for product in products
+                    ),
+                )
+                if not order.address or order.address in coordinates:
+                    order.set_coordinates(coordinates.get(order.address))
+                orders.append(order)
+                order_products.append(products)
+
+            Order.objects.bulk_create(orders)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # SQLite не возвращает id из bulk_create. Пишущая транзакция
+                # в SQLite держит блокировку всей базы, поэтому наши строки -
+                # последние по id и идут в порядке вставки
+                order_ids = list(
+                    Order.objects.order_by('-id')
+                                 .values_list('id', flat=True)[:len(orders)]
+                )
+                for order, order_id in zip(orders, reversed(order_ids)):
+                    order.id = order_id
+
+            for order, products in zip(orders, order_products):
+                for product in products:
+                    product.order = order
+            OrderProduct.objects.bulk_create(
+                product for products in order_products for product in products
+            )
+            created_ids = [order.id for order in orders]
+            OrderEvent.objects.publish(created_ids, OrderEvent.CREATED)
+            transaction.on_commit(
+                lambda: OrderCandidate.objects.refresh_orders(created_ids)
+            )
+        return orders
+
+    def create_from_spool(self, spool_id, entries):
+        """Переносим заказы из очереди приема в базу пачкой.
+        Повтор тех же записей после сбоя ничего не создаст: пара
+        (spool_id, spool_offset) уникальна, уже перенесенные записи
+        пропускаются
+        :param spool_id: OrderSpool.spool_id файла очереди
+        :param entries: пары (offset, заказ) из OrderSpool.read
+        :return: id созданных заказов.
+        """
+        with transaction.atomic():
+            spool_orders = Order.objects.filter(spool_id=spool_id)
+            transferred = set(
+                spool_orders.filter(spool_offset__in=[offset for offset, _ in entries])
+                            .values_list('spool_offset', flat=True)
+            )
+            entries = [
+                (offset, payload) for offset, payload in entries
+                if offset not in transferred
+            ]
+            # bulk_create не вызывает pre_save: координаты берем сами,
+            # неизвестные адреса уходят в очередь геокодера
+            coordinates = geocode_deferred(
+                [payload['address'] for _, payload in entries]
+            )
+            orders = []
+            for offset, payload in entries:
+                order = Order(
+                    spool_id=spool_id,
+                    spool_offset=offset,
+                    firstname=payload['firstname'],
+                    lastname=payload['lastname'],
+                    contact_phone=payload['contact_phone'],
+                    address=payload['address'],
+                    total_price=Decimal(payload['total_price']),
+                )
+                if not order.address or order.address in coordinates:
+                    order.set_coordinates(coordinates.get(order.address))
+                orders.append(order)
+            Order.objects.bulk_create(orders)
+            # На SQLite bulk_create не возвращает id, читаем их по offset
+            offsets = [order.spool_offset for order in orders]
+            order_ids = dict(
+                spool_orders.filter(spool_offset__in=offsets).values_list('spool_offset', 'id')
+            )
+            # Продукт могли удалить, пока заказ ждал в очереди
+            product_ids = set(
+                Product.objects.filter(
+                    id__in={
+                        item['product']
+                        for _, payload in entries for item in payload['products']
+                    },
+                ).values_list('id', flat=True)
+            )
+            OrderProduct.objects.bulk_create(
+                OrderProduct(
+                    order_id=order_ids[offset],
+                    product_id=item['product'],
+                    amount=item['amount'],
+                    product_price=Decimal(item['product_price']),
+                )
+                for offset, payload in entries
+                for item in payload['products']
+                if item['product'] in product_ids
+            )
+            created_ids = list(order_ids.values())
+            OrderEvent.objects.publish(created_ids, OrderEvent.CREATED)
+            transaction.on_commit(
+                lambda: OrderCandidate.objects.refresh_orders(created_ids)
+            )
+        return created_ids
 
+    def filter_by_phone(self, phone):
+        """Заказы по номеру телефона в любом написании, через индекс E.164."""
+        e164 = get_e164(phone)
+        if not e164:
+            return self.none()
+        return self.filter(contact_phone_e164=e164)
 
-class Order(models.Model):
+    def get_restaurants_load(self):
+        """Сколько невыполненных заказов готовит каждый ресторан."""
+        return dict(
+            self.get_not_complete_orders()
+                .filter(cooking_restaurant__isnull=False)
+                .values_list('cooking_restaurant')
+                .annotate(orders_count=Count('id'))
+                .order_by()
+        )
+
+    def assign_cooking_restaurants(self, strategy=None, dry_run=False):
+        """Назначаем готовящий ресторан невыполненным заказам без ресторана.
+        Выбор идет среди материализованных кандидатов заказа, стоимость -
+        расстояние плюс штраф за заказы, которые ресторан уже готовит.
+        Результат пишется одним bulk_update
+        :param strategy: 'greedy' или 'min-cost',
+            по умолчанию settings.ASSIGNMENT_STRATEGY
+        :param dry_run: только посчитать назначения, ничего не сохраняя
+        :return: словарь id заказа - id ресторана.
+        """
+        assign = STRATEGIES[strategy or settings.ASSIGNMENT_STRATEGY]
+        max_candidates = settings.ASSIGNMENT_MAX_CANDIDATES
+        with transaction.atomic():
+            orders = self.get_not_complete_orders() \
+                         .filter(cooking_restaurant__isnull=True)
+            queue = orders.order_by('registrated_at', 'id')
+            if not dry_run:
+                queue = queue.select_for_update()
+            candidates = {
+                order_id: [] for order_id in queue.values_list('id', flat=True)
+            }
+            # Только заблокированные заказы: подзапрос orders увидел бы и те,
+            # что появились после выборки очереди.
+            # float вместо Decimal: на сотнях тысяч строк конвертация
+            # в Decimal дороже самого назначения
+            rows = OrderCandidate.objects.filter(order_id__in=list(candidates)) \
+                .order_by('order_id', F('distance_km').asc(nulls_last=True)) \
+                .values_list(
+                    'order_id',
+                    'restaurant_id',
+                    Cast('distance_km', models.FloatField()),
+                )
+            for order_id, restaurant_id, distance_km in rows.iterator():
+                restaurants = candidates[order_id]
+                if len(restaurants) < max_candidates:
+                    restaurants.append((restaurant_id, distance_km))
+
+            assignment = assign(
+                candidates,
+                load=Order.objects.get_restaurants_load(),
+                load_penalty_km=settings.ASSIGNMENT_LOAD_PENALTY_KM,
+                max_load=settings.ASSIGNMENT_MAX_LOAD,
+            )
+            if not dry_run:
+                Order.objects.bulk_update(
+                    [
+                        Order(id=order_id, cooking_restaurant_id=restaurant_id)
+                        for order_id, restaurant_id in assignment.items()
+                    ],
+                    fields=['cooking_restaurant'],
+                )
+                OrderEvent.objects.publish(list(assignment), OrderEvent.UPDATED)
+        return assignment
+
+
+
+class Order(GeocodedModel):
     """Модель заказа."""
     ORDER_STATUSES = (
         (1, 'Необработанный заказ'),
@@ -180,6 +611,14 @@ class Order(models.Model):
     )
     contact_phone = PhoneNumberField(
         verbose_name='Нормализированный номер телефона',
+        e164_field='contact_phone_e164',
+    )
+    contact_phone_e164 = models.CharField(
+        verbose_name='Телефон в формате E.164',
+        max_length=20,
+        blank=True,
+        db_index=True,
+        editable=False,
     )
     address = models.CharField(
         verbose_name='адрес',
@@ -236,57 +675,85 @@ class Order(models.Model):
         verbose_name='Дата и время доставки',
         db_index=True,
     )
+    spool_id = models.UUIDField(
+        verbose_name='Файл очереди приема заказов',
+        null=True,
+        editable=False,
+    )
+    spool_offset = models.PositiveBigIntegerField(
+        verbose_name='Номер в очереди приема заказов',
+        null=True,
+        editable=False,
+    )
     objects = OrderQuerySet.as_manager()
 
+    # Статус, прочитанный из базы: по нему post_save отличает смену статуса
+    saved_status = None
+
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        permissions = [
+            ('create_order_batch', 'Может загружать заказы пакетами'),
+        ]
+        indexes = [
+            # Порядок и курсор страницы заказов менеджера
+            models.Index(fields=['status', 'registrated_at', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['spool_id', 'spool_offset'],
+                name='unique_order_spool_entry',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        order.saved_status = order.__dict__.get('status')
+        return order
 
-    @staticmethod
-    def find_common_restaurant(restaurants):
-        """Получаем список со списками ресторанов,
-        возвращаем те, которые фигурируют во всех списках
-        :param restaurants: список ресторанов для каждого продукта.
-        """
-        if not restaurants:
-            return None
-        suitable_rests = list(reduce(
-            lambda i, j: i & j, (set(restaurant) for restaurant in restaurants)
-        ))
-        return suitable_rests
-    
     def find_suitable_restaurants(
-            self, restaurants_products,
-            addresses, order_coordinates):
-        """Для каждого продукта в заказе получаем список с ресторанами,
-        способными приготовить этот продукт
-        :param restaurants_products: Ресторан с продуктом, названием рестонана
-        :param addresses: Все адреса в БД в формате словаря
-        :param order_coordinates: Координаты адреса доставки.
+            self, availability_index,
+            spatial_index, max_radius_km=None):
+        """Находим рестораны, способные приготовить все продукты заказа.
+        Если известен адрес доставки, смотрим только рестораны в радиусе
+        доставки, и только для подходящих считаем расстояния
+        :param availability_index: индекс продукт - рестораны
+        :param spatial_index: индекс ресторанов по координатам
+        :param max_radius_km: максимальный радиус доставки в км.
         """
-        suitable_restaurants = []
-        for product in self.products.all():
-            rests_for_product = []
-            for restaurant_product in restaurants_products:
-                if not restaurant_product.product_name == product.name:
-                    continue
-                restaurant_coordinates = find_coordinates(
-                    address=restaurant_product.restaurant_address,
-                    coordinates=addresses,
+        product_ids = [product.id for product in self.products.all()]
+        candidate_ids = None
+        if self.coordinates and max_radius_km:
+            candidate_ids = [
+                restaurant_id for restaurant_id, _ in spatial_index.within(
+                    *self.coordinates,
+                    radius_km=max_radius_km,
                 )
-                distance = geopy.distance.geodesic(
-                    order_coordinates,
-                    restaurant_coordinates,
-                ).km
-                rests_for_product.append(
-                    f'{restaurant_product.restaurant_name} - {round(distance, 2)} км',
-                )
-                distance = geopy.distance.geodesic(
-                    order_coordinates,
-                    restaurant_coordinates,
-                ).km
-            suitable_restaurants.append(rests_for_product)
-        return suitable_restaurants
+            ]
+        restaurant_ids = availability_index.find_restaurants(
+            product_ids,
+            candidate_ids,
+        )
+        distances = distance_matrix(
+            [self.coordinates],
+            [
+                spatial_index.coordinates.get(restaurant_id)
+                for restaurant_id in restaurant_ids
+            ],
+        )[0]
+        suitable_restaurants = [
+            (
+                restaurant_id,
+                None if isnan(distance) else round(float(distance), 2),
+            )
+            for restaurant_id, distance in zip(restaurant_ids, distances)
+        ]
+        return sorted(
+            suitable_restaurants,
+            key=lambda restaurant: (restaurant[1] is None, restaurant[1]),
+        )
 
 
 class OrderProduct(models.Model):
@@ -314,3 +781,384 @@ class OrderProduct(models.Model):
         decimal_places=2,
         validators=[MinValueValidator(0)]
     )
+
+
+class OrderCandidateQuerySet(models.QuerySet):
+
+    def refresh_orders(self, order_ids):
+        """Пересчитываем рестораны для заказов целиком:
+        при создании заказа, смене адреса или состава.
+        Выполненные заказы остаются без кандидатов
+        :param order_ids: id заказов.
+        """
+        orders = list(
+            Order.objects.get_not_complete_orders()
+                         .filter(id__in=order_ids)
+                         .prefetch_related('products')
+        )
+        product_ids = {
+            product.id for order in orders for product in order.products.all()
+        }
+        availability_index = RestaurantMenuItem.objects.filter(
+            product_id__in=product_ids,
+        ).get_availability_index()
+        spatial_index = Restaurant.objects.get_spatial_index()
+        candidates = [
+            OrderCandidate(
+                order=order,
+                restaurant_id=restaurant_id,
+                distance_km=distance,
+            )
+            for order in orders
+            for restaurant_id, distance in order.find_suitable_restaurants(
+                availability_index=availability_index,
+                spatial_index=spatial_index,
+                max_radius_km=settings.MAX_DELIVERY_RADIUS_KM,
+            )
+        ]
+        with transaction.atomic():
+            self.filter(order_id__in=order_ids).delete()
+            self.bulk_create(candidates)
+
+    def refresh_restaurant(self, restaurant_id, product_ids=None):
+        """Пересчитываем один ресторан для невыполненных заказов:
+        при смене его адреса или наличия продуктов в меню
+        :param restaurant_id: id ресторана
+        :param product_ids: продукты, наличие которых изменилось;
+            None - проверить все заказы.
+        """
+        restaurant = Restaurant.objects.filter(id=restaurant_id).first()
+        if not restaurant:
+            return
+        orders = Order.objects.get_not_complete_orders()
+        if product_ids is not None:
+            orders = orders.filter(products__in=product_ids).distinct()
+        orders = list(orders.prefetch_related('products'))
+        available_products = set(
+            RestaurantMenuItem.objects.filter(
+                restaurant_id=restaurant_id,
+                availability=True,
+            ).values_list('product_id', flat=True)
+        )
+        suitable_orders = [
+            order for order in orders
+            if {product.id for product in order.products.all()} <= available_products
+        ]
+        distances = distance_matrix(
+            [order.coordinates for order in suitable_orders],
+            [restaurant.coordinates],
+        )
+        max_radius_km = settings.MAX_DELIVERY_RADIUS_KM
+        candidates = []
+        for order, (distance,) in zip(suitable_orders, distances):
+            distance = None if isnan(distance) else round(float(distance), 2)
+            out_of_radius = order.coordinates and max_radius_km and (
+                distance is None or distance > max_radius_km
+            )
+            if order.products.all() and not out_of_radius:
+                candidates.append(OrderCandidate(
+                    order=order,
+                    restaurant_id=restaurant_id,
+                    distance_km=distance,
+                ))
+        with transaction.atomic():
+            self.filter(
+                order__in=orders,
+                restaurant_id=restaurant_id,
+            ).delete()
+            self.bulk_create(candidates)
+
+    def refresh_menu(self, restaurant_ids, product_ids):
+        """Пересчет после массовой смены наличия. Один ресторан
+        пересчитываем только по измененным продуктам, несколько -
+        через заказы с этими продуктами, за один проход.
+        """
+        if len(restaurant_ids) == 1:
+            self.refresh_restaurant(next(iter(restaurant_ids)), product_ids=product_ids)
+            return
+        order_ids = Order.objects.get_not_complete_orders() \
+                                 .filter(products__in=product_ids) \
+                                 .values_list('id', flat=True) \
+                                 .distinct()
+        self.refresh_orders(list(order_ids))
+
+
+class OrderCandidate(models.Model):
+    """Ресторан, способный приготовить заказ целиком.
+    Поддерживается сигналами при изменении заказов, адресов и меню.
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='candidates',
+        verbose_name='Заказ',
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='order_candidates',
+        verbose_name='Ресторан',
+    )
+    distance_km = models.DecimalField(
+        max_digits=7,
+        decimal_places=2,
+        null=True,
+        verbose_name='Расстояние до адреса доставки, км',
+    )
+    objects = OrderCandidateQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ресторан для заказа'
+        verbose_name_plural = 'рестораны для заказов'
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+        indexes = [
+            models.Index(fields=['order', 'distance_km']),
+        ]
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self):
+        return self.filter(expires_at__lte=timezone.now())
+
+
+class IdempotencyKey(models.Model):
+    """Ключ Idempotency-Key запроса на создание заказа и снимок ответа.
+    Повторный запрос с тем же ключом получает сохраненный ответ.
+    """
+    key = models.CharField(
+        verbose_name='ключ',
+        max_length=255,
+        unique=True,
+    )
+    request_hash = models.CharField(
+        verbose_name='хэш тела запроса',
+        max_length=64,
+    )
+    status_code = models.PositiveSmallIntegerField(
+        verbose_name='код ответа',
+        null=True,
+    )
+    response = models.JSONField(
+        verbose_name='тело ответа',
+        null=True,
+        encoder=DjangoJSONEncoder,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='создан',
+        auto_now_add=True,
+    )
+    expires_at = models.DateTimeField(
+        verbose_name='действует до',
+        db_index=True,
+    )
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+
+# Канал Postgres NOTIFY, в котором транслятор ленты заказов ждет событий
+ORDER_EVENTS_CHANNEL = 'order_events'
+
+
+class OrderEventQuerySet(models.QuerySet):
+
+    def publish(self, order_ids, kind):
+        """Записываем события заказов в той же транзакции, что и изменения.
+        На Postgres NOTIFY доставляется при коммите, повторы в одной
+        транзакции сливаются в одно уведомление
+        :param kind: одно из OrderEvent.KINDS.
+        """
+        if not order_ids:
+            return
+        self.bulk_create(
+            OrderEvent(order_id=order_id, kind=kind) for order_id in order_ids
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [ORDER_EVENTS_CHANNEL, ''])
+
+    def purge_expired(self):
+        """Удаляем события старше ORDER_EVENTS_TTL. Вызывается
+        транслятором, а не при записи: прием заказов не платит за удаление.
+        """
+        return self.filter(
+            created_at__lt=timezone.now() - settings.ORDER_EVENTS_TTL,
+        ).delete()
+
+
+class OrderEvent(models.Model):
+    """Изменение заказа для живой ленты менеджеров."""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    STATUS_CHANGED = 'status'
+    DELETED = 'deleted'
+    KINDS = (
+        (CREATED, 'Создан'),
+        (UPDATED, 'Изменен'),
+        (STATUS_CHANGED, 'Сменил статус'),
+        (DELETED, 'Удален'),
+    )
+    # Не ForeignKey: событие удаления переживает сам заказ
+    order_id = models.PositiveIntegerField(
+        verbose_name='id заказа',
+    )
+    kind = models.CharField(
+        verbose_name='событие',
+        max_length=10,
+        choices=KINDS,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='время события',
+        auto_now_add=True,
+        db_index=True,
+    )
+    objects = OrderEventQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'событие заказа'
+        verbose_name_plural = 'события заказов'
+
+
+# Массовая смена наличия в меню: restaurant_ids и product_ids
+# затронутых пунктов меню
+menu_availability_changed = Signal()
+
+
+@receiver(pre_save, sender=Restaurant)
+@receiver(pre_save, sender=Order)
+def fill_address_coordinates(sender, instance, update_fields=None, **kwargs):
+    """Определяем координаты при создании и при смене адреса.
+    Геокодер здесь не вызывается: неизвестный адрес уходит в очередь.
+    """
+    if update_fields is not None and 'address' not in update_fields:
+        return
+    if instance.pk and instance.geocode_status != GEOCODE_PENDING:
+        saved_address = sender.objects.filter(pk=instance.pk) \
+                                      .values_list('address', flat=True) \
+                                      .first()
+        if saved_address == instance.address:
+            return
+    instance.fill_coordinates()
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def update_restaurant_index(sender, **kwargs):
+    invalidate_restaurant_index()
+
+
+@receiver(post_save, sender=Product)
+def create_product_renditions(sender, instance, **kwargs):
+    """Копии картинки готовим сразу после загрузки, а не на первом запросе."""
+    if instance.image:
+        transaction.on_commit(lambda: get_renditions(instance.image))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_renditions(sender, instance, **kwargs):
+    if instance.image:
+        delete_renditions(instance.image)
+
+
+@receiver(post_delete, sender=Product)
+def add_product_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.id)
+    ProductTombstone.objects.filter(
+        deleted_at__lt=timezone.now() - settings.PRODUCTS_TOMBSTONE_TTL,
+    ).delete()
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def touch_menu_item_product(sender, instance, **kwargs):
+    """Удаленного пункта меню в выборке по updated_at уже нет,
+    отмечаем изменение на самом продукте.
+    """
+    Product.objects.filter(id=instance.product_id) \
+                   .update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(pre_delete, sender=ProductCategory)
+def touch_category_products(sender, instance, **kwargs):
+    """Название категории входит в данные продукта."""
+    instance.products.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Order)
+def publish_order_event(sender, instance, created, **kwargs):
+    if created:
+        kind = OrderEvent.CREATED
+    elif instance.saved_status not in (None, instance.status):
+        kind = OrderEvent.STATUS_CHANGED
+    else:
+        kind = OrderEvent.UPDATED
+    instance.saved_status = instance.status
+    OrderEvent.objects.publish([instance.id], kind)
+
+
+@receiver(post_delete, sender=Order)
+def publish_order_deleted(sender, instance, **kwargs):
+    OrderEvent.objects.publish([instance.id], OrderEvent.DELETED)
+
+
+# Кандидатов пересчитываем после коммита: к этому моменту каскадные
+# удаления уже прошли, а в таблицу не попадут несохраненные данные
+
+@receiver(post_save, sender=Order)
+def update_order_candidates(sender, instance, created, update_fields=None, **kwargs):
+    """Новый заказ еще без продуктов, его пересчитывают после их добавления."""
+    if created:
+        return
+    matching_fields = {'address', 'latitude', 'longitude', 'status'}
+    if update_fields is None or matching_fields & set(update_fields):
+        transaction.on_commit(
+            lambda: OrderCandidate.objects.refresh_orders([instance.id])
+        )
+
+
+@receiver(post_save, sender=OrderProduct)
+@receiver(post_delete, sender=OrderProduct)
+def update_order_products_candidates(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: OrderCandidate.objects.refresh_orders([instance.order_id])
+    )
+
+
+@receiver(post_save, sender=Restaurant)
+def update_restaurant_candidates(sender, instance, created, update_fields=None, **kwargs):
+    """Кандидаты зависят только от координат ресторана: смена названия
+    или телефона их не пересчитывает.
+    """
+    saved_coordinates = instance.saved_coordinates
+    instance.saved_coordinates = instance.coordinates
+    if created:
+        return
+    if update_fields is not None and not {'latitude', 'longitude'} & update_fields:
+        return
+    if saved_coordinates == instance.coordinates:
+        return
+    transaction.on_commit(
+        lambda: OrderCandidate.objects.refresh_restaurant(instance.id)
+    )
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def update_menu_item_candidates(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: OrderCandidate.objects.refresh_restaurant(
+            instance.restaurant_id,
+            product_ids=[instance.product_id],
+        )
+    )
+
+
+@receiver(menu_availability_changed)
+def update_menu_availability_candidates(sender, restaurant_ids, product_ids, **kwargs):
+    transaction.on_commit(
+        lambda: OrderCandidate.objects.refresh_menu(restaurant_ids, product_ids)
+    )
@@ -0,0 +1,15 @@
+from rest_framework.permissions import BasePermission
+
+
+class CanCreateOrderBatch(BasePermission):
+    """Пакетная загрузка заказов - только партнерам с отдельным правом."""
+
+    def has_permission(self, request, view):
+        return request.user.has_perm('foodcartapp.create_order_batch')
+
+
+class CanChangeMenuAvailability(BasePermission):
+    """Наличие в меню меняют те, кто может править пункты меню."""
+
+    def has_permission(self, request, view):
+        return request.user.has_perm('foodcartapp.change_restaurantmenuitem')
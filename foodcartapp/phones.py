@@ -0,0 +1,117 @@
+from functools import lru_cache
+
+import phonenumbers
+from django.conf import settings
+from phonenumber_field import modelfields, serializerfields
+from phonenumber_field.phonenumber import PhoneNumber, to_python
+from rest_framework import serializers
+
+
+class CachedPhoneNumber(PhoneNumber):
+    """PhoneNumber, который уже проверен и отформатирован:
+    is_valid и format_as отдают сохраненные результаты.
+    """
+    formats = None
+    valid = None
+
+    def is_valid(self):
+        if self.valid is None:
+            return super().is_valid()
+        return self.valid
+
+    def format_as(self, format):
+        if self.formats is not None and format in self.formats:
+            return self.formats[format]
+        return super().format_as(format)
+
+
+@lru_cache(maxsize=settings.PHONE_CACHE_SIZE)
+def parse_phone(raw_input, region):
+    """
+    Разбор, проверка и форматирование номера - один раз на пару
+    (строка, регион)
+    :return: (разобранный номер или None, валиден ли, словарь формат - строка)
+    """
+    try:
+        parsed = phonenumbers.parse(raw_input, region, keep_raw_input=True)
+    except phonenumbers.NumberParseException:
+        return None, False, {}
+    if not phonenumbers.is_valid_number(parsed):
+        return parsed, False, {}
+    formats = {
+        fmt: phonenumbers.format_number(parsed, fmt)
+        for fmt in PhoneNumber.format_map.values()
+    }
+    return parsed, True, formats
+
+
+def to_phone_number(value, region=None):
+    """Замена phonenumber_field.phonenumber.to_python с кэшем разбора."""
+    if not isinstance(value, str) or not value:
+        return to_python(value, region=region)
+    parsed, valid, formats = parse_phone(
+        value,
+        region or settings.PHONENUMBER_DEFAULT_REGION,
+    )
+    phone_number = CachedPhoneNumber(raw_input=value)
+    if parsed is not None:
+        # Копия: закэшированный объект не должен меняться снаружи
+        phone_number.merge_from(parsed)
+        phone_number.valid = valid
+        phone_number.formats = formats
+    return phone_number
+
+
+def get_e164(value, region=None):
+    """Номер в E.164 или пустая строка, если номер не валиден."""
+    phone_number = to_phone_number(value, region) if isinstance(value, str) else value
+    if not phone_number or not phone_number.is_valid():
+        return ''
+    return phone_number.format_as(phonenumbers.PhoneNumberFormat.E164)
+
+
+class PhoneNumberDescriptor(modelfields.PhoneNumberDescriptor):
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.name] = to_phone_number(value, region=self.field.region)
+
+
+class PhoneNumberField(modelfields.PhoneNumberField):
+    """Поле модели с кэшем разбора номеров. Если указан e164_field,
+    перед записью, в том числе через bulk_create, заполняет это поле
+    номером в E.164 - по нему номер ищется через индекс.
+    """
+    descriptor_class = PhoneNumberDescriptor
+
+    def __init__(self, *args, e164_field=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.e164_field = e164_field
+
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        if self.e164_field:
+            setattr(model_instance, self.e164_field, get_e164(value, self.region))
+        return value
+
+    def get_prep_value(self, value):
+        if isinstance(value, str) and value:
+            value = to_phone_number(value, region=self.region)
+        return super().get_prep_value(value)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.e164_field:
+            kwargs['e164_field'] = self.e164_field
+        return name, path, args, kwargs
+
+
+class PhoneNumberSerializerField(serializerfields.PhoneNumberField):
+    """Поле сериализатора с кэшем разбора номеров."""
+
+    def to_internal_value(self, data):
+        if not isinstance(data, PhoneNumber):
+            data = to_phone_number(
+                serializers.CharField.to_internal_value(self, data),
+                region=self.region,
+            )
+        return super().to_internal_value(data)
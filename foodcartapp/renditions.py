@@ -0,0 +1,111 @@
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, UnidentifiedImageError
+
+
+RENDITIONS_DIR = 'renditions'
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'WEBP': 'webp',
+}
+
+
+def get_rendition_name(name, width, image_format):
+    """Имя уменьшенной копии в том же хранилище, что и оригинал.
+    Папка - хэш имени оригинала: у нового файла будут новые копии.
+    """
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    folder = hashlib.sha1(name.encode()).hexdigest()[:12]
+    return f'{RENDITIONS_DIR}/{folder}/{stem}-{width}.{EXTENSIONS[image_format]}'
+
+
+def get_rendition_names(name):
+    """Словарь (формат, ширина) - имя копии для всех настроенных вариантов."""
+    return {
+        (image_format, width): get_rendition_name(name, width, image_format)
+        for image_format in settings.IMAGE_RENDITION_FORMATS
+        for width in settings.IMAGE_RENDITION_WIDTHS
+    }
+
+
+def create_renditions(image, names):
+    """
+    Уменьшает оригинал до нужных ширин, не увеличивая маленькие картинки
+    :param image: FieldFile с оригиналом
+    :param names: словарь (формат, ширина) - имя копии
+    """
+    with image.storage.open(image.name, 'rb') as original_file:
+        original = Image.open(original_file)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        has_alpha = original.mode in ('LA', 'PA') or 'transparency' in original.info
+        original = original.convert('RGBA' if has_alpha else 'RGB')
+
+    for (image_format, width), name in names.items():
+        rendition = original.copy()
+        rendition.thumbnail((width, width * 10), Image.LANCZOS)
+        if image_format == 'JPEG' and rendition.mode == 'RGBA':
+            # В JPEG нет прозрачности: кладем картинку на белый фон
+            background = Image.new('RGB', rendition.size, 'white')
+            background.paste(rendition, mask=rendition.getchannel('A'))
+            rendition = background
+        content = BytesIO()
+        rendition.save(
+            content,
+            image_format,
+            quality=settings.IMAGE_RENDITION_QUALITY,
+            optimize=True,
+        )
+        image.storage.save(name, ContentFile(content.getvalue()))
+
+
+def get_renditions(image):
+    """
+    Уменьшенные копии картинки. Недостающие создаются при первом
+    обращении и дальше берутся из хранилища
+    :param image: FieldFile с оригиналом
+    :return: словарь формат - {ширина: url}, пустой, если оригинал
+        не удалось прочитать
+    """
+    if not image:
+        return {}
+    storage = image.storage
+    names = get_rendition_names(image.name)
+    missing = {
+        key: name for key, name in names.items() if not storage.exists(name)
+    }
+    if missing:
+        try:
+            create_renditions(image, missing)
+        except (OSError, UnidentifiedImageError):
+            return {}
+
+    renditions = {}
+    for (image_format, width), name in names.items():
+        renditions.setdefault(image_format, {})[width] = storage.url(name)
+    return renditions
+
+
+def get_rendition_url(image, width, image_format='JPEG'):
+    """Url копии нужной ширины, если ее нет - url оригинала."""
+    urls = get_renditions(image).get(image_format, {})
+    return urls.get(width) or image.url
+
+
+def get_srcset(renditions):
+    """Словарь формат - строка для атрибута srcset."""
+    return {
+        EXTENSIONS[image_format]: ', '.join(
+            f'{url} {width}w' for width, url in sorted(urls.items())
+        )
+        for image_format, urls in renditions.items()
+    }
+
+
+def delete_renditions(image):
+    for name in get_rendition_names(image.name).values():
+        image.storage.delete(name)
@@ -1,11 +1,17 @@
-from .models import Order, Product, OrderProduct
+from .models import (Order, OrderCandidate, Product, OrderProduct,
+                     RestaurantMenuItem)
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.response import Response
 from django.db import transaction
-from phonenumber_field.serializerfields import PhoneNumberField
+
+from .phones import PhoneNumberSerializerField
 
 class OrderProductSerializer(serializers.ModelSerializer):
-    """Сериализатор продукта для OrderProduct"""
+    """Сериализатор продукта для OrderProduct.
+    Продукты по id достает OrderSerializer - одним запросом на весь заказ.
+    """
+    product = serializers.IntegerField()
     quantity = serializers.IntegerField(source='amount')
     class Meta:
         model = OrderProduct
@@ -22,7 +28,7 @@ class OrderSerializer(serializers.ModelSerializer):
         write_only=True,
         required=True,
     )
-    phonenumber = PhoneNumberField(source='contact_phone')
+    phonenumber = PhoneNumberSerializerField(source='contact_phone')
 
     class Meta:
         model = Order
@@ -35,23 +41,121 @@ class OrderSerializer(serializers.ModelSerializer):
             'products',
         )
 
+    def validate_products(self, products_data):
+        """Заменяем id продуктов на сами продукты, один запрос на заказ.
+        При пакетной загрузке продукты всех заказов уже лежат в context.
+        """
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.in_bulk(
+                {product_data['product'] for product_data in products_data}
+            )
+        does_not_exist = serializers.PrimaryKeyRelatedField \
+                                    .default_error_messages['does_not_exist']
+        errors = []
+        for product_data in products_data:
+            product = products.get(product_data['product'])
+            if product is None:
+                errors.append({
+                    'product': [does_not_exist.format(pk_value=product_data['product'])],
+                })
+                continue
+            product_data['product'] = product
+            errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return products_data
+
+    def get_spool_payload(self):
+        """Проверенный заказ в виде JSON для очереди приема заказов."""
+        validated_data = self.validated_data
+        products = [
+            {
+                'product': product_data['product'].id,
+                'amount': product_data['amount'],
+                'product_price': str(product_data['product'].price),
+            } for product_data in validated_data['products']
+        ]
+        return {
+            'firstname': validated_data['firstname'],
+            'lastname': validated_data.get('lastname', ''),
+            'contact_phone': validated_data['contact_phone'].as_e164,
+            'address': validated_data['address'],
+            'total_price': str(sum(
+                product_data['amount'] * product_data['product'].price
+                for product_data in validated_data['products']
+            )),
+            'products': products,
+        }
+
     @transaction.atomic
     def create(self, validated_data):
+        """Заказ пишется один раз, стоимость считаем по ценам на момент
+        оформления, не перечитывая строки заказа из базы.
+        """
         products_data = validated_data.pop('products')
-        order = Order.objects.create(**validated_data)
         order_products = [
             OrderProduct(
-                order=order,
                 product=product_data['product'],
                 amount=product_data['amount'],
                 product_price=product_data['product'].price,
             ) for product_data in products_data
         ]
+        order = Order.objects.create(
+            **validated_data,
+            total_price=sum(
+                order_product.amount * order_product.product_price
+                for order_product in order_products
+            ),
+        )
+        for order_product in order_products:
+            order_product.order = order
         OrderProduct.objects.bulk_create(order_products)
-        final_price = Order.objects.filter(id=order.id)\
-                                   .get_total_price()\
-                                   .first()\
-                                   .final_price
-        order.total_price = final_price
-        order.save(update_fields=['total_price'])
+        transaction.on_commit(
+            lambda: OrderCandidate.objects.refresh_orders([order.id])
+        )
         return order
+
+
+class MenuAvailabilitySerializer(serializers.Serializer):
+    """Массовая смена наличия в меню. Пункты меню выбираются парами
+    items или пересечением списков restaurants, products и categories:
+    пропущенный список выбор не ограничивает.
+    """
+    availability = serializers.BooleanField()
+    items = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.IntegerField(),
+            min_length=2,
+            max_length=2,
+        ),
+        required=False,
+        max_length=settings.MENU_AVAILABILITY_MAX_ITEMS,
+        help_text='Пары [id ресторана, id продукта]',
+    )
+    restaurants = serializers.ListField(child=serializers.IntegerField(), required=False)
+    products = serializers.ListField(child=serializers.IntegerField(), required=False)
+    categories = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, data):
+        selectors = {'items', 'restaurants', 'products', 'categories'} & set(data)
+        if not selectors:
+            raise serializers.ValidationError(
+                'Укажите items или хотя бы один из списков restaurants, products, categories'
+            )
+        if 'items' in selectors and len(selectors) > 1:
+            raise serializers.ValidationError('items нельзя сочетать с другими списками')
+        return data
+
+    def get_menu_items(self):
+        data = self.validated_data
+        if 'items' in data:
+            return RestaurantMenuItem.objects.filter_pairs(data['items'])
+        menu_items = RestaurantMenuItem.objects.all()
+        if 'restaurants' in data:
+            menu_items = menu_items.filter(restaurant_id__in=data['restaurants'])
+        if 'products' in data:
+            menu_items = menu_items.filter(product_id__in=data['products'])
+        if 'categories' in data:
+            menu_items = menu_items.filter(product__category_id__in=data['categories'])
+        return menu_items
@@ -0,0 +1,126 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from distances import haversine_matrix
+
+
+KM_PER_DEGREE = 111.2
+
+
+class RestaurantSpatialIndex:
+    """Сетка ресторанов по координатам: ячейка cell_km x cell_km по широте
+    и cell_km по долготе на экваторе. Поиск смотрит только ячейки,
+    попадающие в нужный радиус.
+    """
+
+    def __init__(self, restaurants, cell_km=5):
+        """
+        :param restaurants: тройки (id ресторана, широта, долгота),
+            рестораны без координат в поиск не попадают
+        :param cell_km: размер ячейки сетки в км
+        """
+        self.cell_degrees = cell_km / KM_PER_DEGREE
+        self.coordinates = {}
+        self.cells = defaultdict(list)
+        for restaurant_id, latitude, longitude in restaurants:
+            if latitude is None or longitude is None:
+                continue
+            point = (float(latitude), float(longitude))
+            self.coordinates[restaurant_id] = point
+            self.cells[self.get_cell(*point)].append(restaurant_id)
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def get_cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    def get_candidates(self, latitude, longitude, radius_km):
+        """Рестораны из ячеек, покрывающих квадрат вокруг радиуса."""
+        latitude_delta = radius_km / KM_PER_DEGREE
+        farthest_latitude = min(abs(latitude) + latitude_delta, 89.9)
+        longitude_delta = min(
+            radius_km / (KM_PER_DEGREE * math.cos(math.radians(farthest_latitude))),
+            180,
+        )
+        min_row, min_column = self.get_cell(
+            latitude - latitude_delta,
+            longitude - longitude_delta,
+        )
+        max_row, max_column = self.get_cell(
+            latitude + latitude_delta,
+            longitude + longitude_delta,
+        )
+        if (max_row - min_row + 1) * (max_column - min_column + 1) > len(self.cells):
+            return list(self.coordinates)
+        candidates = []
+        for row in range(min_row, max_row + 1):
+            for column in range(min_column, max_column + 1):
+                candidates.extend(self.cells.get((row, column), ()))
+        return candidates
+
+    def get_distances(self, latitude, longitude, restaurant_ids):
+        if not restaurant_ids:
+            return np.empty(0)
+        return haversine_matrix(
+            [(latitude, longitude)],
+            [self.coordinates[restaurant_id] for restaurant_id in restaurant_ids],
+        )[0]
+
+    def within(self, latitude, longitude, radius_km):
+        """
+        Рестораны не дальше radius_km от точки, ближайшие первыми
+        :return: список пар (id ресторана, расстояние в км)
+        """
+        candidates = self.get_candidates(latitude, longitude, radius_km)
+        distances = self.get_distances(latitude, longitude, candidates)
+        return sorted(
+            (
+                (restaurant_id, float(distance))
+                for restaurant_id, distance in zip(candidates, distances)
+                if distance <= radius_km
+            ),
+            key=lambda restaurant: restaurant[1],
+        )
+
+    def nearest(self, latitude, longitude, k):
+        """
+        k ближайших к точке ресторанов, ближайшие первыми
+        :return: список пар (id ресторана, расстояние в км)
+        """
+        if k <= 0:
+            return []
+        radius_km = self.cell_degrees * KM_PER_DEGREE
+        while True:
+            restaurants = self.within(latitude, longitude, radius_km)
+            if len(restaurants) >= k or len(restaurants) == len(self):
+                return restaurants[:k]
+            radius_km *= 2
+
+
+_local_index = {'version': None, 'index': None}
+
+
+def get_restaurant_index(load_restaurants, version):
+    """
+    Индекс ресторанов, общий для запросов процесса.
+    Пересобирается, когда меняется version - отпечаток таблицы ресторанов
+    в базе, поэтому изменения из других процессов, например геокодера,
+    видны без общего кэша
+    :param load_restaurants: функция, возвращающая тройки для индекса
+    :param version: любое сравнимое значение, меняющееся вместе с ресторанами
+    """
+    if _local_index['version'] != version:
+        _local_index['index'] = RestaurantSpatialIndex(load_restaurants())
+        _local_index['version'] = version
+    return _local_index['index']
+
+
+def invalidate_restaurant_index():
+    """Сбрасываем индекс процесса, не дожидаясь сверки версии."""
+    _local_index['version'] = None
@@ -0,0 +1,77 @@
+import json
+import sqlite3
+import uuid
+from contextlib import closing
+
+from django.conf import settings
+
+
+class OrderSpool:
+    """
+    Надежная локальная очередь заказов в SQLite-файле в режиме WAL.
+    Запись подтверждается только после fsync, номер записи (offset)
+    растет монотонно и не переиспользуется в пределах файла. У файла
+    есть свой spool_id: в новом файле offset снова начинается с 1, и
+    дренер отличает перенесенные заказы по паре (spool_id, offset)
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.ORDER_SPOOL_PATH
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # FULL - fsync на каждом коммите, подтвержденный заказ не теряется
+        connection.execute('PRAGMA synchronous=FULL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS orders ('
+            'spool_offset INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'payload TEXT NOT NULL)'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+        )
+        connection.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('spool_id', ?)",
+            (uuid.uuid4().hex,),
+        )
+        return connection
+
+    @property
+    def spool_id(self):
+        """Идентификатор файла очереди, создается вместе с файлом."""
+        with closing(self.connect()) as connection:
+            value = connection.execute(
+                "SELECT value FROM meta WHERE key = 'spool_id'"
+            ).fetchone()[0]
+        return uuid.UUID(value)
+
+    def append(self, payload):
+        """
+        :param payload: проверенный заказ, сериализуемый в JSON
+        :return: offset записи - временный номер заказа
+        """
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(
+                'INSERT INTO orders (payload) VALUES (?)',
+                (json.dumps(payload, ensure_ascii=False),),
+            )
+            return cursor.lastrowid
+
+    def read(self, limit):
+        """Самые старые записи: список пар (offset, payload)."""
+        with closing(self.connect()) as connection:
+            rows = connection.execute(
+                'SELECT spool_offset, payload FROM orders ORDER BY spool_offset LIMIT ?',
+                (limit,),
+            ).fetchall()
+        return [(offset, json.loads(payload)) for offset, payload in rows]
+
+    def trim(self, last_offset):
+        """Удаляем записи, уже перенесенные в основную базу."""
+        with closing(self.connect()) as connection:
+            connection.execute('DELETE FROM orders WHERE spool_offset <= ?', (last_offset,))
+
+    def __len__(self):
+        with closing(self.connect()) as connection:
+            return connection.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
@@ -0,0 +1,79 @@
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+
+from foodcartapp.assignment import (assign_greedy, assign_min_cost,
+                                    linear_sum_assignment)
+
+
+class TestAssignGreedy(SimpleTestCase):
+
+    def test_nearest_restaurant(self):
+        """Без загрузки заказ достается ближайшему ресторану."""
+        candidates = {1: [(10, 1.0), (20, 3.0)]}
+        self.assertEqual(assign_greedy(candidates, {}, load_penalty_km=2), {1: 10})
+
+    def test_load_penalty(self):
+        """Загруженный ресторан проигрывает чуть более дальнему."""
+        candidates = {1: [(10, 1.0), (20, 2.0)]}
+        self.assertEqual(
+            assign_greedy(candidates, {10: 1}, load_penalty_km=2),
+            {1: 20},
+        )
+
+    def test_max_load(self):
+        """Заполненный ресторан пропускается, без вариантов заказ остается."""
+        candidates = {1: [(10, 1.0)], 2: [(10, 1.0), (20, 9.0)], 3: [(10, 1.0)]}
+        self.assertEqual(
+            assign_greedy(candidates, {}, load_penalty_km=0, max_load=1),
+            {1: 10, 2: 20},
+        )
+
+    def test_unknown_distance(self):
+        """Ресторан без расстояния выбирается, только если других нет."""
+        candidates = {1: [(10, 30.0), (20, None)], 2: [(20, None)]}
+        self.assertEqual(
+            assign_greedy(candidates, {}, load_penalty_km=0),
+            {1: 10, 2: 20},
+        )
+
+
+@skipIf(linear_sum_assignment is None, 'нужен scipy')
+class TestAssignMinCost(SimpleTestCase):
+
+    def test_total_cost_lower_than_greedy(self):
+        """Жадный отдает первому заказу общий ближайший ресторан,
+        min-cost уступает его второму заказу, которому больше некуда.
+        """
+        candidates = {1: [(10, 1.0), (20, 2.0)], 2: [(10, 1.0), (30, 50.0)]}
+        self.assertEqual(
+            assign_greedy(candidates, {}, load_penalty_km=0, max_load=1),
+            {1: 10, 2: 30},
+        )
+        self.assertEqual(
+            assign_min_cost(candidates, {}, load_penalty_km=0, max_load=1),
+            {1: 20, 2: 10},
+        )
+
+    def test_load_slots(self):
+        """Каждое следующее место в ресторане дороже на штраф."""
+        candidates = {
+            1: [(10, 1.0), (20, 2.5)],
+            2: [(10, 1.0), (20, 2.5)],
+        }
+        self.assertEqual(
+            sorted(assign_min_cost(candidates, {}, load_penalty_km=2).values()),
+            [10, 20],
+        )
+        self.assertEqual(
+            assign_min_cost(candidates, {}, load_penalty_km=1),
+            {1: 10, 2: 10},
+        )
+
+    def test_batches_carry_load(self):
+        """Загрузка из предыдущей пачки учитывается в следующей."""
+        candidates = {1: [(10, 1.0)], 2: [(10, 1.0), (20, 5.0)]}
+        self.assertEqual(
+            assign_min_cost(candidates, {}, load_penalty_km=0, max_load=1, batch_size=1),
+            {1: 10, 2: 20},
+        )
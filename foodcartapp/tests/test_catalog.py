@@ -0,0 +1,158 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from foodcartapp.models import Product, Restaurant, RestaurantMenuItem
+
+
+PRODUCTS_URL = reverse('foodcartapp:products')
+
+
+class TestProductCatalog(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(
+            name='Star Burger',
+            address='Москва, Тверская 1',
+            latitude=55.75,
+            longitude=37.61,
+        )
+        self.product = Product.objects.create(
+            name='Чизбургер',
+            price=100,
+            image='burger.jpg',
+        )
+        RestaurantMenuItem.objects.create(
+            restaurant=restaurant,
+            product=self.product,
+        )
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 после сверки версии."""
+        response = self.client.get(PRODUCTS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Чизбургер')
+        self.assertTrue(response['Last-Modified'])
+
+        with self.assertNumQueries(2):  # версии продуктов и меню
+            response = self.client.get(
+                PRODUCTS_URL,
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidated_on_change(self):
+        """После изменения продукта каталог собирается заново."""
+        etag = self.client.get(PRODUCTS_URL)['ETag']
+        self.product.name = 'Двойной чизбургер'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.client.get(PRODUCTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Двойной чизбургер')
+
+    def test_changed_in_other_process(self):
+        """Изменение без сигналов этого процесса видно по версии из базы."""
+        etag = self.client.get(PRODUCTS_URL)['ETag']
+        Product.objects.filter(id=self.product.id).update(
+            name='Двойной чизбургер',
+            updated_at=timezone.now(),
+        )
+        response = self.client.get(PRODUCTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Двойной чизбургер')
+
+        RestaurantMenuItem.objects.filter(product=self.product).delete()
+        self.assertEqual(self.client.get(PRODUCTS_URL).json(), [])
+
+
+class TestProductChanges(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(
+            name='Star Burger',
+            address='Москва, Тверская 1',
+            latitude=55.75,
+            longitude=37.61,
+        )
+        self.burger, self.fries = [
+            Product.objects.create(name=name, price=100, image='burger.jpg')
+            for name in ('Чизбургер', 'Картошка фри')
+        ]
+        for product in (self.burger, self.fries):
+            RestaurantMenuItem.objects.create(
+                restaurant=self.restaurant,
+                product=product,
+            )
+        self.cursor = self.client.get(PRODUCTS_URL)['X-Catalog-Cursor']
+
+    def get_changes(self):
+        # Перекрытие убираем, чтобы видеть только изменения после курсора
+        with override_settings(PRODUCTS_SYNC_OVERLAP=timedelta(0)):
+            response = self.client.get(PRODUCTS_URL, {'since': self.cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_no_changes(self):
+        changes = self.get_changes()
+        self.assertEqual(changes['products'], [])
+        self.assertEqual(changes['deleted'], [])
+        self.assertGreaterEqual(int(changes['cursor']), int(self.cursor))
+
+    def test_changed_and_removed_products(self):
+        """Изменившийся продукт приходит целиком, снятый с продажи
+        и удаленный - только id.
+        """
+        self.burger.price = 150
+        self.burger.save()
+        RestaurantMenuItem.objects.filter(product=self.fries).get().delete()
+        removed = Product.objects.create(name='Кола', price=50, image='cola.jpg')
+        removed_id = removed.id
+        removed.delete()
+
+        changes = self.get_changes()
+        self.assertEqual(
+            [(product['id'], product['price']) for product in changes['products']],
+            [(self.burger.id, '150.00')],
+        )
+        self.assertEqual(changes['deleted'], sorted([self.fries.id, removed_id]))
+
+    def test_availability_change(self):
+        menu_item = RestaurantMenuItem.objects.get(product=self.fries)
+        menu_item.availability = False
+        menu_item.save()
+        self.assertEqual(self.get_changes()['deleted'], [self.fries.id])
+
+    def test_cursor_of_unchanged_catalog(self):
+        """Каталог не меняется дольше срока хранения удаленных продуктов,
+        а курсор из него по-прежнему годится для ?since=.
+        """
+        later = timezone.now() + settings.PRODUCTS_TOMBSTONE_TTL + timedelta(days=1)
+        with patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(PRODUCTS_URL)
+            self.assertEqual(response.status_code, 200)
+            self.cursor = response['X-Catalog-Cursor']
+            self.assertEqual(self.get_changes()['products'], [])
+
+            response = self.client.get(
+                PRODUCTS_URL,
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['X-Catalog-Cursor'], self.cursor)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(PRODUCTS_URL, {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        # Курсор старше срока хранения удаленных продуктов
+        response = self.client.get(PRODUCTS_URL, {'since': '10'})
+        self.assertEqual(response.status_code, 410)
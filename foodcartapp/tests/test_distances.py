@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+import geopy.distance
+import numpy as np
+
+from distances import distance_matrix
+
+
+MOSCOW = (55.755864, 37.617698)
+SAINT_PETERSBURG = (59.938784, 30.314997)
+KAZAN = (55.796127, 49.106414)
+
+
+class TestDistanceMatrix(SimpleTestCase):
+
+    def test_haversine_close_to_geodesic(self):
+        """Гаверсинусы расходятся с geodesic меньше чем на 0.5%."""
+        matrix = distance_matrix(
+            [MOSCOW, KAZAN],
+            [SAINT_PETERSBURG, MOSCOW, KAZAN],
+            mode='haversine',
+        )
+        self.assertEqual(matrix.shape, (2, 3))
+        expected = geopy.distance.geodesic(MOSCOW, SAINT_PETERSBURG).km
+        self.assertAlmostEqual(matrix[0, 0], expected, delta=expected * 0.005)
+        self.assertAlmostEqual(matrix[0, 1], 0)
+
+    def test_geodesic_mode(self):
+        """Точный режим совпадает с geopy."""
+        matrix = distance_matrix([MOSCOW], [KAZAN], mode='geodesic')
+        self.assertAlmostEqual(
+            matrix[0, 0],
+            geopy.distance.geodesic(MOSCOW, KAZAN).km,
+        )
+
+    def test_unknown_coordinates(self):
+        """Для точек без координат расстояние NaN."""
+        for mode in ('haversine', 'geodesic'):
+            matrix = distance_matrix([None, MOSCOW], [KAZAN], mode=mode)
+            self.assertTrue(np.isnan(matrix[0, 0]))
+            self.assertFalse(np.isnan(matrix[1, 0]))
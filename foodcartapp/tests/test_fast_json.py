@@ -0,0 +1,90 @@
+import gzip
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import skipIf
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+import fast_json
+from foodcartapp.models import Product, Restaurant, RestaurantMenuItem
+
+
+class TestDumps(SimpleTestCase):
+
+    def setUp(self):
+        self.data = {
+            'price': Decimal('349.90'),
+            'name': 'Чизбургер',
+            'registrated_at': datetime(2023, 1, 1, 12, 30, 0, 123456, tzinfo=timezone.utc),
+            7: None,
+        }
+
+    def test_compact_and_decimal_safe(self):
+        """Без пробелов и отступов, Decimal - строкой без потери копеек."""
+        self.assertEqual(
+            fast_json.stdlib_dumps(self.data),
+            '{"price":"349.90","name":"Чизбургер",'
+            '"registrated_at":"2023-01-01T12:30:00.123Z","7":null}'.encode(),
+        )
+
+    @skipIf(fast_json.orjson is None, 'нужен orjson')
+    def test_orjson_matches_stdlib(self):
+        self.assertEqual(
+            fast_json.orjson_dumps(self.data),
+            fast_json.stdlib_dumps(self.data),
+        )
+
+    def test_get_encoding(self):
+        self.assertEqual(fast_json.get_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(fast_json.get_encoding('gzip;q=0, identity'))
+        self.assertIsNone(fast_json.get_encoding(''))
+
+
+@override_settings(JSON_COMPRESSION_MIN_BYTES=100)
+class TestCompressionMiddleware(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(
+            name='Star Burger',
+            address='Москва, Тверская 1',
+            latitude=55.75,
+            longitude=37.61,
+        )
+        for number in range(5):
+            product = Product.objects.create(
+                name=f'Бургер {number}',
+                price=100,
+                image='burger.jpg',
+            )
+            RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+
+    def test_gzip_above_threshold(self):
+        """Большой ответ сжимается, ETag ослабляется, но 304 работает."""
+        url = reverse('foodcartapp:products')
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+
+        response = self.client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(JSON_COMPRESSION_MIN_BYTES=1024)
+    def test_small_response_not_compressed(self):
+        response = self.client.get(
+            reverse('foodcartapp:banners'),
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.json()[0]['title'], 'Burger')
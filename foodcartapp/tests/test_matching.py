@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+
+from foodcartapp.matching import RestaurantAvailabilityIndex
+
+
+class TestRestaurantAvailabilityIndex(SimpleTestCase):
+
+    def setUp(self):
+        self.index = RestaurantAvailabilityIndex([
+            (1, 10),
+            (1, 20),
+            (2, 20),
+            (2, 30),
+            (3, 30),
+        ])
+
+    def test_restaurants_with_all_products(self):
+        """Остаются только рестораны, где есть все продукты заказа."""
+        self.assertEqual(self.index.find_restaurants([1]), [10, 20])
+        self.assertEqual(self.index.find_restaurants([1, 2]), [20])
+        self.assertEqual(self.index.find_restaurants([2, 2, 3]), [30])
+
+    def test_no_suitable_restaurants(self):
+        """Неизвестный продукт или пустой заказ - ресторанов нет."""
+        self.assertEqual(self.index.find_restaurants([1, 3]), [])
+        self.assertEqual(self.index.find_restaurants([404]), [])
+        self.assertEqual(self.index.find_restaurants([]), [])
@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from foodcartapp.models import (GEOCODE_RESOLVED, Order, OrderCandidate,
+                                OrderProduct, Product, ProductCategory,
+                                Restaurant, RestaurantMenuItem,
+                                menu_availability_changed)
+
+
+AVAILABILITY_URL = reverse('foodcartapp:menu_availability')
+
+
+class TestMenuAvailability(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        manager = get_user_model().objects.create(username='admin', is_staff=True)
+        manager.user_permissions.add(
+            Permission.objects.get(codename='change_restaurantmenuitem'),
+        )
+        self.client.force_login(manager)
+        self.burgers = ProductCategory.objects.create(name='Бургеры')
+        self.burger = Product.objects.create(
+            name='Чизбургер', price=100, image='burger.jpg', category=self.burgers,
+        )
+        self.fries = Product.objects.create(name='Картофель', price=50, image='fries.jpg')
+        self.restaurants = [
+            Restaurant.objects.create(
+                name=f'Star Burger {number}',
+                latitude=55.75,
+                longitude=37.61,
+                geocode_status=GEOCODE_RESOLVED,
+            )
+            for number in range(3)
+        ]
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in self.restaurants
+            for product in (self.burger, self.fries)
+        )
+        self.events = []
+        menu_availability_changed.connect(self.record_event)
+        self.addCleanup(menu_availability_changed.disconnect, self.record_event)
+
+    def record_event(self, sender, **kwargs):
+        self.events.append(kwargs)
+
+    def post(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(AVAILABILITY_URL, data, content_type='application/json')
+
+    def get_unavailable(self):
+        return set(
+            RestaurantMenuItem.objects.filter(availability=False)
+                                      .values_list('restaurant_id', 'product_id')
+        )
+
+    def test_one_update_and_one_event(self):
+        first, second, _ = self.restaurants
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({
+                'availability': False,
+                'items': [[first.id, self.burger.id], [second.id, self.fries.id]],
+            })
+        self.assertEqual(response.json(), {'updated': 2})
+        self.assertEqual(
+            self.get_unavailable(),
+            {(first.id, self.burger.id), (second.id, self.fries.id)},
+        )
+        updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "foodcartapp_restaurantmenuitem"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.events, [{
+            'signal': menu_availability_changed,
+            'restaurant_ids': {first.id, second.id},
+            'product_ids': {self.burger.id, self.fries.id},
+        }])
+
+        # Повтор ничего не меняет и событий не отправляет
+        response = self.post({
+            'availability': False,
+            'items': [[first.id, self.burger.id], [second.id, self.fries.id]],
+        })
+        self.assertEqual(response.json(), {'updated': 0})
+        self.assertEqual(len(self.events), 1)
+
+    def test_restaurant_and_category(self):
+        first = self.restaurants[0]
+        response = self.post({
+            'availability': False,
+            'restaurants': [first.id],
+            'categories': [self.burgers.id],
+        })
+        self.assertEqual(response.json(), {'updated': 1})
+        self.assertEqual(self.get_unavailable(), {(first.id, self.burger.id)})
+
+        response = self.post({'availability': False, 'restaurants': [first.id]})
+        self.assertEqual(response.json(), {'updated': 1})
+        response = self.post({'availability': False, 'categories': [self.burgers.id]})
+        self.assertEqual(response.json(), {'updated': 2})
+        self.assertEqual(len(self.get_unavailable()), 4)
+
+    def test_caches_and_candidates_refreshed(self):
+        order = Order.objects.create(
+            firstname='Иван', contact_phone='+79991234567', address='',
+        )
+        OrderProduct.objects.create(order=order, product=self.burger, amount=1, product_price=100)
+        OrderCandidate.objects.refresh_orders([order.id])
+        self.assertEqual(order.candidates.count(), 3)
+        self.assertEqual(len(self.client.get(reverse('foodcartapp:products')).json()), 2)
+
+        self.post({'availability': False, 'products': [self.burger.id]})
+        self.assertEqual(order.candidates.count(), 0)
+        products = self.client.get(reverse('foodcartapp:products')).json()
+        self.assertEqual([product['name'] for product in products], ['Картофель'])
+
+    def test_validation_and_permissions(self):
+        response = self.post({'availability': False})
+        self.assertEqual(response.status_code, 400)
+        response = self.post({
+            'availability': False,
+            'items': [[1, 2]],
+            'restaurants': [1],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_unavailable(), set())
+
+        for user in (
+                get_user_model().objects.create(username='client'),
+                get_user_model().objects.create(username='staff', is_staff=True)):
+            self.client.force_login(user)
+            response = self.post({'availability': False, 'restaurants': [self.restaurants[0].id]})
+            self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get_unavailable(), set())
+
+    def test_admin_grid(self):
+        self.client.force_login(
+            get_user_model().objects.create(username='root', is_staff=True, is_superuser=True)
+        )
+        url = reverse('admin:foodcartapp_restaurant_availability')
+        response = self.client.get(url, {'category': self.burgers.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row[1] for row in response.context['rows']], ['Чизбургер'])
+        self.assertContains(response, 'type="checkbox"', count=3)
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from foodcartapp.admin import OrderAdmin
+from foodcartapp.models import Order, Restaurant
+
+
+CHANGELIST_URL = reverse('admin:foodcartapp_order_changelist')
+
+
+class TestOrderChangeList(TestCase):
+
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create(
+                username='admin', is_staff=True, is_superuser=True,
+            )
+        )
+        restaurant = Restaurant.objects.create(name='Star Burger')
+        Order.objects.bulk_create(
+            Order(
+                firstname=f'Клиент {number}',
+                contact_phone=f'+7999123{number:04d}',
+                address='Москва',
+                status=number % 4 + 1,
+                cooking_restaurant=restaurant if number % 2 else None,
+            )
+            for number in range(25)
+        )
+        self.order_ids = list(Order.objects.order_by('-id').values_list('id', flat=True))
+
+    def get_page(self, url=CHANGELIST_URL, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        changelist = response.context['cl']
+        return [order.id for order in changelist.result_list], changelist
+
+    @patch.object(OrderAdmin, 'list_per_page', 10)
+    def test_cursor_navigation(self):
+        with CaptureQueriesContext(connection) as queries:
+            order_ids, changelist = self.get_page()
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+        self.assertIsNone(changelist.previous_page_url)
+        self.assertEqual(changelist.result_count, 25)
+        pages = [order_ids]
+        while changelist.next_page_url:
+            order_ids, changelist = self.get_page(CHANGELIST_URL + changelist.next_page_url)
+            pages.append(order_ids)
+        self.assertEqual(sum(pages, []), self.order_ids)
+
+        order_ids, _ = self.get_page(CHANGELIST_URL + changelist.previous_page_url)
+        self.assertEqual(order_ids, pages[1])
+
+    def test_filters_drop_cursor(self):
+        order_ids, changelist = self.get_page(status=2, after=self.order_ids[0])
+        self.assertEqual(
+            order_ids,
+            list(
+                Order.objects.filter(status=2, id__lt=self.order_ids[0])
+                             .order_by('-id')
+                             .values_list('id', flat=True)
+            ),
+        )
+        self.assertNotIn('after', changelist.get_query_string({'payment': 1}))
+
+        order_ids, _ = self.get_page(cooking_restaurant__isempty=1)
+        self.assertEqual(len(order_ids), 13)
+
+    def test_search_by_phone_and_id(self):
+        order = Order.objects.get(contact_phone='+79991230007')
+        self.assertEqual(self.get_page(q='8 (999) 123-00-07')[0], [order.id])
+        self.assertEqual(self.get_page(q=str(order.id))[0], [order.id])
+        self.assertEqual(self.get_page(q='Клиент')[0], [])
+
+    def test_empty_search_with_estimated_count(self):
+        """На Postgres пустая выборка не доходит до EXPLAIN."""
+        with patch.object(connection, 'vendor', 'postgresql'):
+            order_ids, changelist = self.get_page(q='Клиент')
+        self.assertEqual(order_ids, [])
+        self.assertEqual(changelist.result_count, 0)
+        self.assertFalse(changelist.result_count_estimated)
@@ -0,0 +1,298 @@
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from foodcartapp.models import Order, OrderProduct, Product
+from foodcartapp.spool import OrderSpool
+
+
+ORDER_URL = reverse('foodcartapp:order')
+
+
+class TestOrderCreate(APITestCase):
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(
+                name=f'Бургер {number}',
+                price=Decimal('100.50') + number,
+                image='burger.jpg',
+            )
+            for number in range(5)
+        ]
+
+    def post_order(self, products):
+        return self.client.post(ORDER_URL, {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, Тверская 1',
+            'products': products,
+        }, format='json')
+
+    def test_total_price(self):
+        response = self.post_order([
+            {'product': self.products[0].id, 'quantity': 2},
+            {'product': self.products[1].id, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(id=response.json()['id'])
+        self.assertEqual(order.total_price, Decimal('302.50'))
+        self.assertEqual(
+            sorted(order.order_detail.values_list('product_price', flat=True)),
+            [Decimal('100.50'), Decimal('101.50')],
+        )
+
+    def test_constant_queries(self):
+        """Число запросов не зависит от размера корзины."""
+        queries = []
+        for products in (self.products[:1], self.products):
+            with CaptureQueriesContext(connection) as context:
+                response = self.post_order([
+                    {'product': product.id, 'quantity': 1} for product in products
+                ])
+            self.assertEqual(response.status_code, 201)
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_unknown_product(self):
+        response = self.post_order([
+            {'product': self.products[0].id, 'quantity': 1},
+            {'product': 404, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['products']
+        self.assertEqual(errors[0], {})
+        self.assertIn('404', errors[1]['product'][0])
+        self.assertFalse(Order.objects.exists())
+
+
+class TestIdempotencyKey(APITestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Чизбургер',
+            price=100,
+            image='burger.jpg',
+        )
+        self.order_data = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, Тверская 1',
+            'products': [{'product': self.product.id, 'quantity': 1}],
+        }
+
+    def post_order(self, order_data, key):
+        return self.client.post(
+            ORDER_URL,
+            order_data,
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay(self):
+        """Повтор с тем же ключом возвращает первый ответ без нового заказа."""
+        first = self.post_order(self.order_data, 'order-1')
+        self.assertEqual(first.status_code, 201)
+
+        with CaptureQueriesContext(connection) as context:
+            replay = self.post_order(self.order_data, 'order-1')
+        # Ни валидации с поиском продуктов, ни вставок заказа
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'foodcartapp_product' in query['sql'] or 'foodcartapp_order' in query['sql']
+        ])
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.post_order(self.order_data, 'order-2')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_other_request_with_same_key(self):
+        self.post_order(self.order_data, 'order-1')
+        self.order_data['address'] = 'Москва, Арбат 1'
+        response = self.post_order(self.order_data, 'order-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_not_saved(self):
+        """Ответ с ошибкой не запоминается, исправленный запрос проходит."""
+        response = self.post_order({**self.order_data, 'products': None}, 'order-1')
+        self.assertEqual(response.status_code, 400)
+        response = self.post_order(self.order_data, 'order-1')
+        self.assertEqual(response.status_code, 201)
+
+
+class TestOrderSpool(APITestCase):
+
+    def setUp(self):
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+        settings_override = override_settings(
+            ORDER_SPOOL_ENABLED=True,
+            ORDER_SPOOL_PATH=os.path.join(spool_dir, 'spool.sqlite3'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.products = [
+            Product.objects.create(name=name, price=price, image='burger.jpg')
+            for name, price in (('Чизбургер', 100), ('Картошка фри', 50))
+        ]
+
+    def post_order(self, products):
+        return self.client.post(ORDER_URL, {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, Тверская 1',
+            'products': [
+                {'product': product.id, 'quantity': 2} for product in products
+            ],
+        }, format='json')
+
+    def test_accepted_then_drained(self):
+        """Заказ подтверждается без записи в базу и появляется после переноса."""
+        response = self.post_order(self.products)
+        self.assertEqual(response.status_code, 202)
+        offset = response.json()['provisional_id']
+        self.assertFalse(Order.objects.exists())
+
+        call_command('drain_order_spool', once=True, stdout=StringIO())
+        order = Order.objects.get(spool_offset=offset)
+        self.assertEqual(order.total_price, Decimal('300.00'))
+        self.assertEqual(order.order_detail.count(), 2)
+        self.assertEqual(len(OrderSpool()), 0)
+
+    def test_replay_is_exactly_once(self):
+        """Повторный перенос тех же записей после сбоя не дублирует заказы."""
+        self.post_order(self.products[:1])
+        self.post_order(self.products)
+        spool = OrderSpool()
+        entries = spool.read(10)
+
+        self.assertEqual(len(Order.objects.create_from_spool(spool.spool_id, entries[:1])), 1)
+        # Сбой до trim: дренер перечитывает очередь с начала
+        self.assertEqual(len(Order.objects.create_from_spool(spool.spool_id, entries)), 1)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderProduct.objects.count(), 3)
+
+    def test_recreated_spool_not_skipped(self):
+        """В новом файле очереди offset снова с 1, но заказы не теряются."""
+        first_offset = self.post_order(self.products).json()['provisional_id']
+        call_command('drain_order_spool', once=True, stdout=StringIO())
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(settings.ORDER_SPOOL_PATH + suffix):
+                os.remove(settings.ORDER_SPOOL_PATH + suffix)
+
+        second_offset = self.post_order(self.products[:1]).json()['provisional_id']
+        self.assertEqual(second_offset, first_offset)
+        call_command('drain_order_spool', once=True, stdout=StringIO())
+        self.assertEqual(Order.objects.filter(spool_offset=first_offset).count(), 2)
+        self.assertEqual(len(OrderSpool()), 0)
+
+    def test_invalid_order_not_spooled(self):
+        response = self.client.post(ORDER_URL, {'firstname': 'Иван'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(OrderSpool()), 0)
+
+
+@override_settings(ORDER_BATCH_CHUNK_SIZE=2)
+class TestOrderBatch(APITestCase):
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=name, price=price, image='burger.jpg')
+            for name, price in (('Чизбургер', 100), ('Картошка фри', 50))
+        ]
+        partner = get_user_model().objects.create(username='partner')
+        partner.user_permissions.add(
+            Permission.objects.get(codename='create_order_batch'),
+        )
+        self.client.force_authenticate(partner)
+
+    def get_order(self, number, products):
+        return {
+            'firstname': f'Клиент {number}',
+            'lastname': '',
+            'phonenumber': '+79991234567',
+            'address': f'Москва, Тверская {number}',
+            'products': [
+                {'product': product_id, 'quantity': 1} for product_id in products
+            ],
+        }
+
+    def test_per_item_results(self):
+        """Ошибочный заказ не мешает остальным, id совпадают с заказами."""
+        burger, fries = [product.id for product in self.products]
+        orders = [
+            self.get_order(0, [burger]),
+            self.get_order(1, [404]),
+            self.get_order(2, [burger, fries]),
+            self.get_order(3, [fries]),
+            {'firstname': 'Без адреса'},
+        ]
+        response = self.client.post(
+            reverse('foodcartapp:orders_batch'),
+            orders,
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result['created'], result['failed']), (3, 2))
+        results = result['results']
+        self.assertEqual([item['index'] for item in results], [0, 1, 2, 3, 4])
+        self.assertIn('products', results[1]['errors'])
+        self.assertIn('address', results[4]['errors'])
+        for index, total_price in ((0, 100), (2, 150), (3, 50)):
+            order = Order.objects.get(id=results[index]['id'])
+            self.assertEqual(order.firstname, f'Клиент {index}')
+            self.assertEqual(order.total_price, total_price)
+        self.assertEqual(OrderProduct.objects.count(), 4)
+
+    def test_ndjson(self):
+        burger = self.products[0].id
+        body = '\n'.join(
+            json.dumps(self.get_order(number, [burger])) for number in range(3)
+        )
+        response = self.client.post(
+            reverse('foodcartapp:orders_batch'),
+            body,
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.json()['created'], 3)
+
+        response = self.client.post(
+            reverse('foodcartapp:orders_batch'),
+            '{"firstname": ',
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_partner_permission_required(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create(username='client'),
+        )
+        response = self.client.post(
+            reverse('foodcartapp:orders_batch'),
+            [self.get_order(0, [self.products[0].id])],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Order.objects.exists())
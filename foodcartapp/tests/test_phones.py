@@ -0,0 +1,51 @@
+from django.test import TestCase
+
+from foodcartapp.models import Order
+from foodcartapp.phones import get_e164, parse_phone, to_phone_number
+
+
+class TestPhoneCache(TestCase):
+
+    def test_parsed_once(self):
+        """Повторный разбор того же номера берется из кэша."""
+        parse_phone.cache_clear()
+        for _ in range(3):
+            phone_number = to_phone_number('8 (999) 123-45-67')
+        self.assertEqual(parse_phone.cache_info().misses, 1)
+        self.assertEqual(parse_phone.cache_info().hits, 2)
+        self.assertTrue(phone_number.is_valid())
+        self.assertEqual(phone_number.as_e164, '+79991234567')
+        self.assertEqual(str(phone_number), '8 (999) 123-45-67')
+
+    def test_copies_are_independent(self):
+        first = to_phone_number('+79991234567')
+        first.national_number = 1
+        self.assertEqual(to_phone_number('+79991234567').as_e164, '+79991234567')
+
+    def test_invalid(self):
+        self.assertFalse(to_phone_number('123').is_valid())
+        self.assertEqual(get_e164('not a phone'), '')
+
+    def test_e164_column(self):
+        """Колонка E.164 заполняется и при save, и при bulk_create."""
+        Order.objects.create(
+            firstname='Иван',
+            contact_phone='8 999 123-45-67',
+            address='Москва, Тверская 1',
+        )
+        Order.objects.bulk_create([
+            Order(
+                firstname='Петр',
+                contact_phone='+7 (999) 765-43-21',
+                address='Москва, Тверская 2',
+            ),
+        ])
+        self.assertEqual(
+            sorted(Order.objects.values_list('contact_phone_e164', flat=True)),
+            ['+79991234567', '+79997654321'],
+        )
+        self.assertEqual(
+            Order.objects.filter_by_phone('+7 999 123 45 67').get().firstname,
+            'Иван',
+        )
+        self.assertFalse(Order.objects.filter_by_phone('123').exists())
@@ -0,0 +1,60 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from foodcartapp.models import Product
+from foodcartapp.renditions import get_renditions, get_srcset
+
+
+class TestRenditions(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            IMAGE_RENDITION_WIDTHS=(100, 300),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        content = BytesIO()
+        Image.new('RGBA', (1200, 800), (255, 0, 0, 128)).save(content, 'PNG')
+        self.product = Product.objects.create(name='Чизбургер', price=100)
+        self.product.image.save('burger.png', ContentFile(content.getvalue()))
+
+    def test_resized_variants(self):
+        """Копии уменьшены с сохранением пропорций в нужных форматах."""
+        renditions = get_renditions(self.product.image)
+        self.assertEqual(set(renditions), {'WEBP', 'JPEG'})
+        for image_format, urls in renditions.items():
+            self.assertEqual(set(urls), {100, 300})
+            name = urls[300][len('/media/'):]
+            with default_storage.open(name) as rendition_file:
+                rendition = Image.open(rendition_file)
+                self.assertEqual(rendition.format, image_format)
+                self.assertEqual(rendition.size, (300, 200))
+
+        srcset = get_srcset(renditions)
+        self.assertRegex(srcset['webp'], r'^\S+-100\.webp 100w, \S+-300\.webp 300w$')
+
+    def test_cached_on_disk(self):
+        """Повторно копии не создаются."""
+        get_renditions(self.product.image)
+        with patch.object(default_storage, 'open', side_effect=AssertionError):
+            self.assertTrue(get_renditions(self.product.image))
+
+    def test_broken_original(self):
+        self.product.image.name = 'missing.jpg'
+        self.assertEqual(get_renditions(self.product.image), {})
+
+    def test_deleted_with_product(self):
+        urls = get_renditions(self.product.image)['JPEG']
+        self.product.delete()
+        self.assertFalse(default_storage.exists(urls[100][len('/media/'):]))
@@ -0,0 +1,82 @@
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from distances import haversine_matrix
+from foodcartapp.models import Restaurant
+from foodcartapp.spatial import RestaurantSpatialIndex
+
+
+ORDER = (55.755864, 37.617698)
+RESTAURANTS = [
+    (1, 55.757, 37.615),
+    (2, 55.80, 37.60),
+    (3, 55.70, 37.80),
+    (4, 59.938784, 30.314997),
+    (5, None, None),
+]
+
+
+class TestRestaurantSpatialIndex(SimpleTestCase):
+
+    def setUp(self):
+        self.index = RestaurantSpatialIndex(RESTAURANTS, cell_km=2)
+        located = [restaurant for restaurant in RESTAURANTS if restaurant[1]]
+        self.distances = dict(zip(
+            [restaurant[0] for restaurant in located],
+            haversine_matrix(
+                [ORDER],
+                [restaurant[1:] for restaurant in located],
+            )[0],
+        ))
+
+    def test_within(self):
+        """В радиус попадают те же рестораны, что и при полном переборе."""
+        for radius_km in (1, 6, 15, 1000):
+            expected = sorted(
+                restaurant_id
+                for restaurant_id, distance in self.distances.items()
+                if distance <= radius_km
+            )
+            found = self.index.within(*ORDER, radius_km=radius_km)
+            self.assertEqual(
+                sorted(restaurant_id for restaurant_id, _ in found),
+                expected,
+            )
+            self.assertEqual(
+                [distance for _, distance in found],
+                sorted(distance for _, distance in found),
+            )
+
+    def test_nearest(self):
+        """Ближайшие рестораны по порядку, без ресторанов без координат."""
+        expected = sorted(self.distances, key=self.distances.get)
+        self.assertEqual(
+            [restaurant_id for restaurant_id, _ in self.index.nearest(*ORDER, k=2)],
+            expected[:2],
+        )
+        self.assertEqual(
+            [restaurant_id for restaurant_id, _ in self.index.nearest(*ORDER, k=10)],
+            expected,
+        )
+
+
+class TestRestaurantIndexVersion(TestCase):
+
+    def test_sees_changes_from_other_processes(self):
+        """Индекс пересобирается по версии из базы, без сигналов и кэша."""
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        self.assertFalse(
+            Restaurant.objects.get_spatial_index().nearest(*ORDER, k=1),
+        )
+
+        # Так координаты сохраняет геокодер в своем процессе
+        Restaurant.objects.filter(id=restaurant.id).update(
+            latitude=RESTAURANTS[0][1],
+            longitude=RESTAURANTS[0][2],
+            updated_at=timezone.now(),
+        )
+        nearest = Restaurant.objects.get_spatial_index().nearest(*ORDER, k=1)
+        self.assertEqual(
+            [restaurant_id for restaurant_id, _ in nearest],
+            [restaurant.id],
+        )
@@ -1,14 +1,16 @@
 from django.urls import path
 
-from .views import product_list_api, banners_list_api, test_template, OrderCreateView, OrderUpdateDeleteView
+from .views import product_list_api, banners_list_api, test_template, OrderCreateView, OrderUpdateDeleteView, OrderBatchCreateView, MenuAvailabilityView
 
 app_name = "foodcartapp"
 
 
 urlpatterns = [
     path('test/', test_template),
-    path('products/', product_list_api),
+    path('products/', product_list_api, name='products'),
     path('banners/', banners_list_api, name='banners'),
     path('order/', OrderCreateView.as_view(), name='order'),
     path('order/<int:pk>/', OrderUpdateDeleteView.as_view()),
+    path('orders/batch/', OrderBatchCreateView.as_view(), name='orders_batch'),
+    path('menu/availability/', MenuAvailabilityView.as_view(), name='menu_availability'),
 ]
@@ -1,17 +1,35 @@
-from django.http import JsonResponse
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponse
 from django.templatetags.static import static
 import json
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from fast_json import JSONResponse, NDJSONParser
 
-from .models import Product, Order, OrderProduct
+from .catalog import get_catalog, make_cursor, parse_cursor
+from .renditions import get_renditions, get_srcset
+from .models import (IdempotencyKey, Order, OrderProduct, Product,
+                     ProductTombstone, RestaurantMenuItem)
+from .permissions import CanChangeMenuAvailability, CanCreateOrderBatch
 from rest_framework.generics import CreateAPIView, UpdateAPIView, DestroyAPIView
-from .serializers import OrderSerializer
-from django.db import transaction
+from .serializers import MenuAvailabilitySerializer, OrderSerializer
+from .spool import OrderSpool
+from django.db import DatabaseError, IntegrityError, transaction
+from rest_framework import status
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 
 def banners_list_api(request):
     # FIXME move data to db?
-    return JsonResponse([
+    return JSONResponse([
         {
             'title': 'Burger',
             'src': static('burger.jpg'),
@@ -27,37 +45,103 @@ def banners_list_api(request):
             'src': static('tasty.jpg'),
             'text': 'Food is incomplete without a tasty dessert',
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    ], safe=False)
 
 
-def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'srcset': get_srcset(get_renditions(product.image)),
+        'restaurant': {
             'id': product.id,
             'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
         }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
+    }
+
+
+def serialize_products():
+    products = Product.objects.select_related('category').available()
+    return [serialize_product(product) for product in products]
+
+
+def product_list_api(request):
+    """Каталог отдается из кэша, повторный запрос с ETag получает 304.
+    С ?since=<курсор> отдаются только изменения после курсора.
+    """
+    if 'since' in request.GET:
+        return product_changes_api(request.GET['since'])
+
+    # Курсор - время запроса, взятое до сверки версии: все, что изменится
+    # после, придет по ?since=. Время сборки копии в кэше для этого не годится -
+    # каталог может не меняться дольше PRODUCTS_TOMBSTONE_TTL
+    cursor = make_cursor(timezone.now())
+    catalog = get_catalog(
+        serialize_products,
+        version=(
+            Product.objects.get_version(),
+            RestaurantMenuItem.objects.get_version(),
+        ),
+    )
+    etag = quote_etag(catalog['etag'])
+    last_modified = int(catalog['last_modified'].timestamp())
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    if response is None:
+        response = HttpResponse(catalog['content'], content_type='application/json')
+    # И в 304: клиент с неизменным каталогом обновляет свой курсор
+    response['X-Catalog-Cursor'] = cursor
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def product_changes_api(cursor):
+    """
+    Изменения каталога после курсора
+    :return: products - измененные продукты в продаже, deleted - id
+        удаленных и снятых с продажи продуктов, cursor - для следующего запроса
+    """
+    now = timezone.now()
+    try:
+        since = parse_cursor(cursor)
+    except ValueError:
+        return JSONResponse({'error': 'Некорректный курсор'}, status=400)
+    if since < now - settings.PRODUCTS_TOMBSTONE_TTL:
+        return JSONResponse(
+            {'error': 'Курсор устарел, загрузите каталог целиком'},
+            status=410,
+        )
+
+    since -= settings.PRODUCTS_SYNC_OVERLAP
+    products = Product.objects.changed_since(since) \
+                              .select_related('category') \
+                              .with_availability()
+    updated_products = []
+    deleted_ids = set(
+        ProductTombstone.objects.filter(deleted_at__gt=since)
+                                .values_list('product_id', flat=True)
+    )
+    for product in products:
+        if product.is_available:
+            updated_products.append(serialize_product(product))
+        else:
+            deleted_ids.add(product.id)
+    return JSONResponse({
+        'products': updated_products,
+        'deleted': sorted(deleted_ids),
+        'cursor': make_cursor(now),
     })
 
 
@@ -86,7 +170,7 @@ def register_order(request):
             amount=product['quantity']
 
         )
-    return JsonResponse({})
+    return JSONResponse({})
 
 """
 def check_products(order_datail):
@@ -97,10 +181,164 @@ def check_products(order_datail):
 
 
 class OrderCreateView(CreateAPIView):
-    """Создает заказ."""
+    """Создает заказ.
+    С заголовком Idempotency-Key повтор запроса не создает второй заказ,
+    а получает ответ на первый.
+    """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
 
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return self.create_order(request, *args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response(
+                {'error': 'Некорректный Idempotency-Key'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_hash = hashlib.sha256(request.body).hexdigest()
+        # Заказ и ключ коммитятся вместе. Параллельный дубль ждет
+        # на уникальном индексе ключа и после коммита получает готовый ответ,
+        # а при ошибке ключ откатывается вместе с заказом
+        with transaction.atomic():
+            IdempotencyKey.objects.filter(key=key).expired().delete()
+            try:
+                with transaction.atomic():
+                    idempotency_key = IdempotencyKey.objects.create(
+                        key=key,
+                        request_hash=request_hash,
+                        expires_at=timezone.now() + settings.IDEMPOTENCY_KEY_TTL,
+                    )
+            except IntegrityError:
+                idempotency_key = None
+            if idempotency_key is not None:
+                response = self.create_order(request, *args, **kwargs)
+                idempotency_key.status_code = response.status_code
+                idempotency_key.response = response.data
+                idempotency_key.save(update_fields=['status_code', 'response'])
+                return response
+
+        saved_key = IdempotencyKey.objects.get(key=key)
+        if saved_key.request_hash != request_hash:
+            return Response(
+                {'error': 'Idempotency-Key уже использован для другого запроса'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            saved_key.response,
+            status=saved_key.status_code,
+            headers={'Idempotent-Replayed': 'true'},
+        )
+
+    def create_order(self, request, *args, **kwargs):
+        """В режиме очереди заказ после проверки пишется в локальную
+        очередь и подтверждается сразу с временным номером, в базу его
+        переносит drain_order_spool.
+        """
+        if not settings.ORDER_SPOOL_ENABLED:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        offset = OrderSpool().append(serializer.get_spool_payload())
+        return Response(
+            {**serializer.data, 'provisional_id': offset},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class OrderBatchCreateView(APIView):
+    """Пакетная загрузка заказов от партнеров: JSON-массив или NDJSON.
+    Продукты всех заказов достаются одним запросом, заказы пишутся
+    bulk_create частями, каждая часть - в своей транзакции.
+    В ответе - результат по каждому заказу в порядке запроса.
+    Доступна пользователям партнеров с правом create_order_batch.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+    permission_classes = [CanCreateOrderBatch]
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'error': 'Ожидается список заказов'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > settings.ORDER_BATCH_MAX_SIZE:
+            return Response(
+                {'error': f'Не больше {settings.ORDER_BATCH_MAX_SIZE} заказов за раз'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        context = {
+            'request': request,
+            'products': Product.objects.in_bulk(get_product_ids(items)),
+        }
+        results = [None] * len(items)
+        valid_items = []
+        for index, item in enumerate(items):
+            serializer = OrderSerializer(data=item, context=context)
+            if serializer.is_valid():
+                valid_items.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'errors': serializer.errors}
+
+        chunk_size = settings.ORDER_BATCH_CHUNK_SIZE
+        for start in range(0, len(valid_items), chunk_size):
+            chunk = valid_items[start:start + chunk_size]
+            try:
+                orders = Order.objects.create_batch(
+                    [order_data for _, order_data in chunk]
+                )
+            except DatabaseError:
+                for index, _ in chunk:
+                    results[index] = {
+                        'index': index,
+                        'errors': {'non_field_errors': ['Не удалось сохранить заказ']},
+                    }
+                continue
+            for (index, _), order in zip(chunk, orders):
+                results[index] = {'index': index, 'id': order.id}
+
+        created = sum('id' in result for result in results)
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        })
+
+
+def get_product_ids(items):
+    """id продуктов из еще не проверенных заказов, мусор пропускаем."""
+    product_ids = set()
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('products'), list):
+            continue
+        for product_data in item['products']:
+            if not isinstance(product_data, dict):
+                continue
+            try:
+                product_ids.add(int(product_data.get('product')))
+            except (TypeError, ValueError):
+                continue
+    return product_ids
+
+
+class MenuAvailabilityView(APIView):
+    """Массовая смена наличия продуктов в меню ресторанов:
+    одним UPDATE на все выбранные пункты меню.
+    """
+    permission_classes = [IsAdminUser, CanChangeMenuAvailability]
+
+    def post(self, request):
+        serializer = MenuAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = serializer.get_menu_items().set_availability(
+            serializer.validated_data['availability'],
+        )
+        return Response({'updated': updated})
+
 
 class OrderUpdateDeleteView(UpdateAPIView, DestroyAPIView):
     """Получает и удаляет заказ."""
@@ -0,0 +1,249 @@
+import queue
+import select
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from fast_json import dumps
+from foodcartapp.models import ORDER_EVENTS_CHANNEL, Order, OrderEvent
+
+RELOAD_MESSAGE = b'event: reload\ndata: {}\n\n'
+PING_MESSAGE = b': ping\n\n'
+
+
+def render_order_rows(order_ids):
+    """Строки таблицы заказов одним запросом. Выполненных и удаленных
+    заказов в словаре нет - их строки со страницы убираются.
+    """
+    orders = Order.objects.get_not_complete_orders() \
+                          .get_cooking_restaurant_name() \
+                          .filter(id__in=order_ids)
+    next_url = reverse('restaurateur:view_orders')
+    return {
+        order.id: render_to_string(
+            'order_row.html',
+            {'order': order, 'next_url': next_url},
+        )
+        for order in orders
+    }
+
+
+def make_message(event, html):
+    data = dumps({'order': event.order_id, 'kind': event.kind, 'html': html})
+    return b'id: %d\nevent: order\ndata: %s\n\n' % (event.id, data)
+
+
+class FeedFull(Exception):
+    """Подписчиков у процесса уже ORDER_FEED_MAX_CONNECTIONS."""
+
+
+class Subscriber:
+    def __init__(self):
+        self.messages = queue.Queue(maxsize=settings.ORDER_FEED_QUEUE_SIZE)
+        # Клиент не успевал читать и пропустил события
+        self.overflowed = False
+
+
+class OrderFeed:
+    """
+    Один транслятор событий заказов на процесс. Поток читает новые
+    OrderEvent - по NOTIFY на Postgres или раз в ORDER_FEED_POLL_INTERVAL
+    на других базах, - один раз рендерит измененные строки и раздает
+    готовые сообщения всем подключенным менеджерам. Последние сообщения
+    хранятся в памяти: переподключившийся клиент получает пропущенное
+    по Last-Event-ID без запросов к базе
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+        self.buffer = deque(maxlen=settings.ORDER_FEED_BUFFER_SIZE)
+        # Последний прочитанный id и пропуски перед ним: id выдаются
+        # при вставке, а видны после коммита, не по порядку
+        self.last_id = None
+        self.gaps = {}
+        self.purged_at = None
+
+    def subscribe(self, last_event_id=None):
+        """
+        :param last_event_id: id последнего полученного клиентом события
+        :return: (подписчик, сообщения для повтора)
+        :raises FeedFull: открыто ORDER_FEED_MAX_CONNECTIONS лент
+        """
+        subscriber = Subscriber()
+        with self.lock:
+            if len(self.subscribers) >= settings.ORDER_FEED_MAX_CONNECTIONS:
+                raise FeedFull
+            if self.thread is None:
+                self.buffer.clear()
+                self.last_id = None
+                self.gaps = {}
+                self.start()
+            self.subscribers.add(subscriber)
+            replay = self.get_replay(last_event_id)
+        return subscriber, replay
+
+    def get_replay(self, last_event_id):
+        if last_event_id is None:
+            return []
+        event_ids = [event_id for event_id, _ in self.buffer]
+        if last_event_id not in event_ids:
+            return [RELOAD_MESSAGE]
+        position = event_ids.index(last_event_id) + 1
+        return [message for _, message in list(self.buffer)[position:]]
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='order-feed', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            with self.listen() as wait:
+                while True:
+                    with self.lock:
+                        if not self.subscribers:
+                            self.thread = None
+                            return
+                    self.poll()
+                    wait(settings.ORDER_FEED_POLL_INTERVAL)
+        except Exception:
+            with self.lock:
+                self.thread = None
+                for subscriber in self.subscribers:
+                    subscriber.overflowed = True
+                self.subscribers.clear()
+            raise
+        finally:
+            connection.close()
+
+    @staticmethod
+    @contextmanager
+    def listen():
+        """Функция ожидания событий: LISTEN на Postgres, иначе пауза."""
+        if connection.vendor != 'postgresql':
+            yield time.sleep
+            return
+
+        connection.ensure_connection()
+        raw_connection = connection.connection
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {ORDER_EVENTS_CHANNEL}')
+
+        def wait(timeout):
+            if select.select([raw_connection], [], [], timeout)[0]:
+                raw_connection.poll()
+                raw_connection.notifies.clear()
+
+        yield wait
+
+    def poll(self):
+        """Читаем новые события и раздаем их подписчикам.
+        События читаются по id. Пропущенный id - событие транзакции, которая
+        еще не закоммитилась: его ищем в следующих опросах. Если пропуск
+        не заполнился за ORDER_FEED_GAP_TIMEOUT, подписчики получают reload
+        """
+        now = timezone.now()
+        if self.purged_at is None or self.purged_at < now - settings.ORDER_EVENTS_PURGE_INTERVAL:
+            OrderEvent.objects.purge_expired()
+            self.purged_at = now
+        if self.last_id is None:
+            # Начинаем с запасом ORDER_FEED_OVERLAP: изменения, сделанные
+            # между загрузкой страницы и подпиской, тоже придут
+            self.last_id = OrderEvent.objects.filter(
+                created_at__lt=now - settings.ORDER_FEED_OVERLAP,
+            ).aggregate(last_id=Max('id'))['last_id'] or 0
+        events = list(
+            OrderEvent.objects.filter(
+                Q(id__gt=self.last_id) | Q(id__in=list(self.gaps)),
+            ).order_by('id')
+        )
+        for event in events:
+            self.gaps.pop(event.id, None)
+            if event.id > self.last_id:
+                self.gaps.update(
+                    (missing_id, now)
+                    for missing_id in range(self.last_id + 1, event.id)
+                )
+                self.last_id = event.id
+        expired_gaps = [
+            missing_id for missing_id, missed_at in self.gaps.items()
+            if missed_at < now - settings.ORDER_FEED_GAP_TIMEOUT
+        ]
+        for missing_id in expired_gaps:
+            del self.gaps[missing_id]
+        if expired_gaps:
+            # Откатившаяся или слишком долгая транзакция - строки могли устареть
+            self.broadcast([(None, RELOAD_MESSAGE)])
+        if not events:
+            return
+
+        rows = render_order_rows({event.order_id for event in events})
+        messages = [
+            (event.id, make_message(event, rows.get(event.order_id)))
+            for event in events
+        ]
+        self.broadcast(messages)
+
+    def broadcast(self, messages):
+        """
+        :param messages: пары (id события, сообщение); сообщения без id
+            в буфер для повтора не попадают
+        """
+        with self.lock:
+            self.buffer.extend(
+                (event_id, message) for event_id, message in messages
+                if event_id is not None
+            )
+            for subscriber in list(self.subscribers):
+                try:
+                    for _, message in messages:
+                        subscriber.messages.put_nowait(message)
+                except queue.Full:
+                    subscriber.overflowed = True
+                    self.subscribers.discard(subscriber)
+
+    def stream(self, last_event_id=None):
+        """Тело ответа text/event-stream для одного менеджера.
+        Каждая открытая лента занимает поток сервера, поэтому сверх
+        ORDER_FEED_MAX_CONNECTIONS клиент сразу отпускается и
+        переподключается через ORDER_FEED_BUSY_RETRY_MS
+        """
+        try:
+            subscriber, replay = self.subscribe(last_event_id)
+        except FeedFull:
+            yield b'retry: %d\n\n' % settings.ORDER_FEED_BUSY_RETRY_MS
+            return
+        try:
+            yield b'retry: %d\n\n' % settings.ORDER_FEED_RETRY_MS
+            yield from replay
+            deadline = time.monotonic() + settings.ORDER_FEED_MAX_SECONDS
+            while not subscriber.overflowed:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    # Браузер переподключится сам и продолжит с Last-Event-ID
+                    return
+                try:
+                    yield subscriber.messages.get(
+                        timeout=min(timeout, settings.ORDER_FEED_HEARTBEAT),
+                    )
+                except queue.Empty:
+                    yield PING_MESSAGE
+            yield RELOAD_MESSAGE
+        finally:
+            self.unsubscribe(subscriber)
+
+
+order_feed = OrderFeed()
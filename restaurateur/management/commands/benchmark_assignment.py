@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.db import transaction
+
+from foodcartapp.assignment import STRATEGIES
+from foodcartapp.models import Order, OrderCandidate
+from foodcartapp.spatial import invalidate_restaurant_index
+from .benchmark_orders_page import Command as OrdersPageBenchmark
+
+
+class Command(OrdersPageBenchmark):
+    help = 'Замеряет автоназначение ресторанов на тестовых заказах'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(orders=5000, restaurants=100, runs=3)
+        parser.add_argument(
+            '--strategy',
+            choices=list(STRATEGIES),
+            action='append',
+            help='По умолчанию замеряются все стратегии',
+        )
+
+    def handle(self, *args, **options):
+        strategies = options['strategy'] or list(STRATEGIES)
+        # Все тестовые данные откатываются после замера
+        with transaction.atomic():
+            self.create_fixtures(options)
+            order_ids = list(
+                Order.objects.filter(address__startswith='Москва, тестовый заказ')
+                             .values_list('id', flat=True)
+            )
+            started_at = time.perf_counter()
+            OrderCandidate.objects.refresh_orders(order_ids)
+            refresh_time = time.perf_counter() - started_at
+
+            self.stdout.write(
+                f'{options["orders"]} заказов x {options["restaurants"]} ресторанов, '
+                f'запусков: {options["runs"]}'
+            )
+            self.stdout.write(f'кандидаты посчитаны за {refresh_time:.1f} с')
+            for strategy in strategies:
+                self.measure_strategy(strategy, options['runs'])
+            transaction.set_rollback(True)
+        invalidate_restaurant_index()
+
+    def measure_strategy(self, strategy, runs):
+        timings = []
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            assignment = Order.objects.assign_cooking_restaurants(
+                strategy=strategy,
+                dry_run=True,
+            )
+            timings.append(time.perf_counter() - started_at)
+        restaurants_load = {}
+        for restaurant_id in assignment.values():
+            restaurants_load[restaurant_id] = restaurants_load.get(restaurant_id, 0) + 1
+        self.stdout.write(
+            f'{strategy}: медиана {statistics.median(timings) * 1000:.0f} мс, '
+            f'назначено {len(assignment)}, '
+            f'максимум заказов на ресторан {max(restaurants_load.values(), default=0)}'
+        )
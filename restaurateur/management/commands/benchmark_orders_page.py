@@ -0,0 +1,119 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from foodcartapp.models import (GEOCODE_RESOLVED, Order, OrderProduct,
+                                Product, Restaurant, RestaurantMenuItem)
+from foodcartapp.spatial import invalidate_restaurant_index
+from restaurateur.views import view_orders
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время отрисовки страницы заказов менеджера на тестовых данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--products', type=int, default=20)
+        parser.add_argument('--products-per-order', type=int, default=3)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--mode',
+            choices=['haversine', 'geodesic'],
+            default='haversine',
+        )
+
+    def handle(self, *args, **options):
+        # Все тестовые данные откатываются после замера
+        with transaction.atomic():
+            self.create_fixtures(options)
+            timings, queries = self.measure(options)
+            transaction.set_rollback(True)
+        invalidate_restaurant_index()
+
+        self.stdout.write(
+            f'{options["orders"]} заказов x {options["restaurants"]} ресторанов, '
+            f'режим {options["mode"]}, запусков: {options["runs"]}'
+        )
+        self.stdout.write(f'медиана: {statistics.median(timings) * 1000:.1f} мс')
+        self.stdout.write(f'минимум: {min(timings) * 1000:.1f} мс')
+        self.stdout.write(f'SQL-запросов на страницу: {queries}')
+
+    def create_fixtures(self, options):
+        rnd = random.Random(0)
+
+        Restaurant.objects.bulk_create(
+            Restaurant(
+                name=f'Ресторан {number}',
+                address=f'Москва, тестовый ресторан {number}',
+                **self.random_coordinates(rnd),
+            )
+            for number in range(options['restaurants'])
+        )
+        restaurants = list(Restaurant.objects.filter(
+            address__startswith='Москва, тестовый ресторан',
+        ))
+        invalidate_restaurant_index()
+        Product.objects.bulk_create(
+            Product(name=f'Бургер {number}', price=100, image='burger.jpg')
+            for number in range(options['products'])
+        )
+        products = list(Product.objects.filter(name__startswith='Бургер '))
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in restaurants
+            for product in products
+        )
+
+        Order.objects.bulk_create(
+            Order(
+                firstname='Тест',
+                contact_phone='+79991234567',
+                address=f'Москва, тестовый заказ {number}',
+                **self.random_coordinates(rnd),
+            )
+            for number in range(options['orders'])
+        )
+        orders = list(Order.objects.filter(
+            address__startswith='Москва, тестовый заказ',
+        ))
+        OrderProduct.objects.bulk_create(
+            OrderProduct(
+                order=order,
+                product=product,
+                amount=1,
+                product_price=product.price,
+            )
+            for order in orders
+            for product in rnd.sample(products, options['products_per_order'])
+        )
+
+    @staticmethod
+    def random_coordinates(rnd):
+        # Координаты заранее заданы, чтобы не ходить в геокодер
+        return {
+            'latitude': round(55.55 + rnd.random() * 0.4, 6),
+            'longitude': round(37.35 + rnd.random() * 0.5, 6),
+            'geocode_status': GEOCODE_RESOLVED,
+        }
+
+    def measure(self, options):
+        user = get_user_model()(username='benchmark', is_staff=True)
+        request = RequestFactory().get('/manager/orders/')
+        request.user = user
+
+        timings = []
+        with override_settings(DISTANCE_MODE=options['mode'], DEBUG=True):
+            for _ in range(options['runs']):
+                reset_queries()
+                started_at = time.perf_counter()
+                view_orders(request)
+                timings.append(time.perf_counter() - started_at)
+            queries = len(connection.queries)
+        return timings, queries
@@ -0,0 +1,50 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import RequestFactory
+
+from foodcartapp.spatial import invalidate_restaurant_index
+from restaurateur.views import view_products
+from .benchmark_orders_page import Command as OrdersPageBenchmark
+
+
+class Command(OrdersPageBenchmark):
+    help = 'Замеряет отрисовку страницы меню менеджера на тестовых данных'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(orders=0, restaurants=300, products=1000, products_per_order=0)
+
+    def handle(self, *args, **options):
+        # Все тестовые данные откатываются после замера
+        with transaction.atomic():
+            self.create_fixtures(options)
+            request = RequestFactory().get('/manager/products/')
+            request.user = get_user_model()(username='benchmark', is_staff=True)
+            cold_timings, warm_timings = [], []
+            for _ in range(options['runs']):
+                # Версия данных между запусками не меняется, чистим кэш целиком
+                cache.clear()
+                cold_timings.append(self.measure_page(request))
+                warm_timings.append(self.measure_page(request))
+            transaction.set_rollback(True)
+        cache.clear()
+        invalidate_restaurant_index()
+
+        self.stdout.write(
+            f'{options["products"]} продуктов x {options["restaurants"]} ресторанов, '
+            f'запусков: {options["runs"]}'
+        )
+        self.stdout.write(f'без кэша: медиана {statistics.median(cold_timings) * 1000:.0f} мс')
+        self.stdout.write(f'из кэша: медиана {statistics.median(warm_timings) * 1000:.0f} мс')
+
+    @staticmethod
+    def measure_page(request):
+        started_at = time.perf_counter()
+        response = view_products(request)
+        for _ in response.streaming_content:
+            pass
+        return time.perf_counter() - started_at
@@ -0,0 +1,55 @@
+from django.db.models import Q
+
+from foodcartapp.catalog import make_cursor, parse_cursor
+
+
+ORDERS_KEYSET = ('status', 'registrated_at', 'id')
+
+
+def make_order_cursor(order):
+    """Курсор страницы заказов: статус, время регистрации и id заказа."""
+    return f'{order.status}.{make_cursor(order.registrated_at)}.{order.id}'
+
+
+def parse_order_cursor(cursor):
+    """
+    :return: кортеж значений ORDERS_KEYSET
+    :raises ValueError: курсор поврежден
+    """
+    status, registrated_at, order_id = cursor.split('.')
+    return int(status), parse_cursor(registrated_at), int(order_id)
+
+
+def get_keyset_filter(fields, values, reverse=False):
+    """Условие «строка после values» в порядке fields:
+    (a > x) or (a = x and b > y) or (a = x and b = y and c > z)
+    """
+    lookup = 'lt' if reverse else 'gt'
+    condition = Q()
+    for position, field in enumerate(fields):
+        equal = dict(zip(fields[:position], values[:position]))
+        condition |= Q(**equal, **{f'{field}__{lookup}': values[position]})
+    return condition
+
+
+def get_keyset_page(queryset, page_size, after=None, before=None, fields=ORDERS_KEYSET):
+    """
+    Страница без OFFSET: база читает только page_size + 1 строку от курсора
+    по индексу на fields, как бы далеко ни была страница
+    :param after: значения fields последней строки предыдущей страницы
+    :param before: значения fields первой строки следующей страницы
+    :return: (строки страницы, есть ли страница раньше, есть ли дальше)
+    """
+    ordering = [f'-{field}' for field in fields] if before else list(fields)
+    queryset = queryset.order_by(*ordering)
+    if before:
+        queryset = queryset.filter(get_keyset_filter(fields, before, reverse=True))
+    elif after:
+        queryset = queryset.filter(get_keyset_filter(fields, after))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        return rows[::-1], has_more, True
+    return rows, bool(after), has_more
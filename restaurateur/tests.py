@@ -1,3 +1,416 @@
-from django.test import TestCase
+import re
+import threading
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from foodcartapp.models import (GEOCODE_RESOLVED, Order, OrderCandidate,
+                                OrderEvent, OrderProduct, Product, Restaurant,
+                                RestaurantMenuItem)
+from restaurateur.feed import RELOAD_MESSAGE, OrderFeed
+
+
+class TestOrderCandidates(TestCase):
+
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create(username='manager', is_staff=True)
+        )
+        self.burger = Product.objects.create(name='burger', price=100, image='burger.jpg')
+        self.fries = Product.objects.create(name='fries', price=50, image='fries.jpg')
+        self.near = self.create_restaurant('near', 55.757, 37.615, [self.burger, self.fries])
+        self.far = self.create_restaurant('far', 55.80, 37.60, [self.burger, self.fries])
+        self.create_restaurant('no fries', 55.756, 37.617, [self.burger])
+        self.create_restaurant('too far', 59.93, 30.31, [self.burger, self.fries])
+
+        self.order = Order.objects.create(
+            firstname='Ivan',
+            contact_phone='+79991234567',
+            address='Москва, Красная площадь',
+        )
+        Order.objects.filter(id=self.order.id).update(
+            latitude=55.755864,
+            longitude=37.617698,
+            geocode_status=GEOCODE_RESOLVED,
+        )
+        for product in (self.burger, self.fries):
+            OrderProduct.objects.create(
+                order=self.order,
+                product=product,
+                amount=1,
+                product_price=product.price,
+            )
+        OrderCandidate.objects.refresh_orders([self.order.id])
+
+    @staticmethod
+    def create_restaurant(name, latitude, longitude, products):
+        restaurant = Restaurant.objects.create(name=name)
+        Restaurant.objects.filter(id=restaurant.id).update(
+            latitude=latitude,
+            longitude=longitude,
+            geocode_status=GEOCODE_RESOLVED,
+        )
+        # update не отправляет post_save, сбрасываем индекс сохранением
+        Restaurant.objects.get(id=restaurant.id).save()
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for product in products
+        )
+        return restaurant
+
+    def get_candidates(self, **params):
+        url = reverse('restaurateur:order_candidates', args=(self.order.id,))
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['candidates']
+
+    def test_candidates_sorted_by_distance(self):
+        """Только рестораны со всем заказом в радиусе доставки, ближние первыми."""
+        candidates = self.get_candidates()
+        self.assertEqual(
+            [candidate['id'] for candidate in candidates],
+            [self.near.id, self.far.id],
+        )
+        self.assertLess(candidates[0]['distance_km'], candidates[1]['distance_km'])
+
+    def test_top_k(self):
+        """Параметр k ограничивает число ресторанов."""
+        candidates = self.get_candidates(k=1)
+        self.assertEqual([candidate['id'] for candidate in candidates], [self.near.id])
+
+    def test_menu_change_updates_candidates(self):
+        """Снятый с продажи продукт убирает ресторан из кандидатов."""
+        menu_item = RestaurantMenuItem.objects.get(
+            restaurant=self.near,
+            product=self.fries,
+        )
+        menu_item.availability = False
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.save()
+        self.assertEqual(
+            [candidate['id'] for candidate in self.get_candidates()],
+            [self.far.id],
+        )
+
+        menu_item.availability = True
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.save()
+        self.assertEqual(
+            [candidate['id'] for candidate in self.get_candidates()],
+            [self.near.id, self.far.id],
+        )
+
+    def test_restaurant_refreshed_only_on_move(self):
+        """Кандидаты ресторана пересчитываются, только если он переехал."""
+        restaurant = Restaurant.objects.get(id=self.far.id)
+        with patch.object(OrderCandidate.objects, 'refresh_restaurant') as refresh:
+            restaurant.name = 'renamed'
+            with self.captureOnCommitCallbacks(execute=True):
+                restaurant.save()
+            refresh.assert_not_called()
+
+        restaurant.latitude, restaurant.longitude = 55.7559, 37.6177
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant.save()
+        self.assertEqual(
+            [candidate['id'] for candidate in self.get_candidates()],
+            [self.far.id, self.near.id],
+        )
+
+    def test_assign_cooking_restaurants(self):
+        """Заказ без ресторана получает ближайший, dry-run ничего не пишет."""
+        self.assertEqual(
+            Order.objects.assign_cooking_restaurants(dry_run=True),
+            {self.order.id: self.near.id},
+        )
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.cooking_restaurant_id)
+
+        Order.objects.assign_cooking_restaurants()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.cooking_restaurant_id, self.near.id)
+        self.assertEqual(Order.objects.assign_cooking_restaurants(), {})
+
+
+class TestOrdersPage(TestCase):
+
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create(username='manager', is_staff=True)
+        )
+        self.restaurant = Restaurant.objects.create(name='restaurant')
+        Order.objects.bulk_create(
+            Order(
+                firstname=f'client {number}',
+                contact_phone='+79991234567',
+                address='Москва',
+                status=number % 3 + 1,
+                payment=number % 2 + 1,
+                cooking_restaurant=self.restaurant if number % 4 == 0 else None,
+            )
+            for number in range(25)
+        )
+        Order.objects.create(
+            firstname='done',
+            contact_phone='+79991234567',
+            address='Москва',
+            status=4,
+        )
+
+    def get_order_ids(self, url=None, **params):
+        response = self.client.get(url or reverse('restaurateur:view_orders'), params)
+        self.assertEqual(response.status_code, 200)
+        order_ids = [order.id for order in response.context['order_items']]
+        return order_ids, response.context
+
+    def test_pages_cover_all_orders_in_order(self):
+        expected = list(
+            Order.objects.get_not_complete_orders()
+                         .order_by('status', 'registrated_at', 'id')
+                         .values_list('id', flat=True)
+        )
+        order_ids, context = self.get_order_ids(page_size=10)
+        self.assertNotIn('previous_page_url', context)
+        pages = [order_ids]
+        while 'next_page_url' in context:
+            order_ids, context = self.get_order_ids(context['next_page_url'])
+            pages.append(order_ids)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+
+        order_ids, context = self.get_order_ids(context['previous_page_url'])
+        self.assertEqual(order_ids, pages[1])
+        self.assertIn('page_size=10', context['previous_page_url'])
+
+    def test_filters(self):
+        order_ids, _ = self.get_order_ids(status=2, payment=1, restaurant='unassigned')
+        self.assertEqual(
+            order_ids,
+            list(
+                Order.objects.filter(status=2, payment=1, cooking_restaurant=None)
+                             .order_by('registrated_at', 'id')
+                             .values_list('id', flat=True)
+            ),
+        )
+        order_ids, _ = self.get_order_ids(restaurant='assigned')
+        self.assertEqual(len(order_ids), 7)
+        order_ids, _ = self.get_order_ids(registrated_from='2000-01-01', registrated_to='2000-01-02')
+        self.assertEqual(order_ids, [])
+
+    @override_settings(MANAGER_ORDERS_MAX_PAGE_SIZE=3)
+    def test_page_size_cap_and_bad_cursor(self):
+        order_ids, _ = self.get_order_ids(page_size=1000, after='broken')
+        self.assertEqual(len(order_ids), 3)
+
+
+def start_without_thread(feed):
+    # Транслятор опрашивается в тестах вручную, в потоке теста
+    feed.thread = threading.current_thread()
+
+
+@patch.object(OrderFeed, 'start', start_without_thread)
+class TestOrdersFeed(TestCase):
+
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create(username='manager', is_staff=True)
+        )
+        self.feed = OrderFeed()
+        self.order = Order.objects.create(
+            firstname='Ivan',
+            contact_phone='+79991234567',
+            address='Москва',
+        )
+
+    def read_messages(self, subscriber):
+        messages = []
+        while not subscriber.messages.empty():
+            messages.append(subscriber.messages.get_nowait())
+        return messages
+
+    def test_order_events(self):
+        order = Order.objects.get(id=self.order.id)
+        order.comment = 'позвонить'
+        order.save()
+        order.status = 2
+        order.save()
+        order.delete()
+        self.assertEqual(
+            list(OrderEvent.objects.order_by('id').values_list('kind', flat=True)),
+            ['created', 'updated', 'status', 'deleted'],
+        )
+
+    def test_poll_renders_rows_once_for_all_subscribers(self):
+        first, _ = self.feed.subscribe()
+        second, _ = self.feed.subscribe()
+        Order.objects.filter(id=self.order.id).update(comment='позвонить')
+        OrderEvent.objects.publish([self.order.id], OrderEvent.UPDATED)
+        # Событие о создании записано до подписки: с учетом запаса по
+        # времени оно тоже приходит, но только один раз
+        # Удаление устаревших, начало чтения, события и строки заказов
+        with self.assertNumQueries(4):
+            self.feed.poll()
+        with self.assertNumQueries(1):
+            self.feed.poll()
+
+        messages = self.read_messages(first)
+        self.assertEqual(messages, self.read_messages(second))
+        self.assertEqual(len(messages), 2)
+        self.assertIn(b'event: order', messages[-1])
+        self.assertIn('позвонить'.encode(), messages[-1])
+        self.assertIn(f'data-order-id=\\"{self.order.id}\\"'.encode(), messages[-1])
+
+    def test_expired_events_purged_by_feed(self):
+        """Прием заказов не удаляет старые события, это делает транслятор."""
+        OrderEvent.objects.update(created_at=timezone.now() - timedelta(days=1))
+        with self.assertNumQueries(1):
+            OrderEvent.objects.publish([self.order.id], OrderEvent.UPDATED)
+        self.assertEqual(OrderEvent.objects.count(), 2)
+
+        self.feed.subscribe()
+        self.feed.poll()
+        self.assertEqual(
+            list(OrderEvent.objects.values_list('kind', flat=True)),
+            [OrderEvent.UPDATED],
+        )
+
+    def publish_with_id(self, event_id, created_at=None):
+        OrderEvent.objects.create(id=event_id, order_id=self.order.id, kind=OrderEvent.UPDATED)
+        if created_at:
+            OrderEvent.objects.filter(id=event_id).update(created_at=created_at)
+
+    def test_late_commit_fills_gap(self):
+        """Событие транзакции, закоммиченной позже следующих, не теряется."""
+        subscriber, _ = self.feed.subscribe()
+        self.feed.poll()
+        created_event = OrderEvent.objects.get()
+        self.publish_with_id(created_event.id + 2)
+        self.feed.poll()
+        # Записано минуту назад, закоммичено только сейчас
+        self.publish_with_id(
+            created_event.id + 1,
+            created_at=timezone.now() - timedelta(minutes=1),
+        )
+        self.feed.poll()
+
+        self.assertEqual(
+            [event_id for event_id, _ in self.feed.buffer],
+            [created_event.id, created_event.id + 2, created_event.id + 1],
+        )
+        self.assertEqual(len(self.read_messages(subscriber)), 3)
+        self.assertEqual(self.feed.gaps, {})
+
+    @override_settings(ORDER_FEED_GAP_TIMEOUT=timedelta(seconds=60))
+    def test_unfilled_gap_sends_reload(self):
+        subscriber, _ = self.feed.subscribe()
+        self.feed.poll()
+        self.publish_with_id(OrderEvent.objects.get().id + 2)
+        self.feed.poll()
+        self.read_messages(subscriber)
+
+        later = timezone.now() + timedelta(seconds=61)
+        with patch('django.utils.timezone.now', return_value=later):
+            self.feed.poll()
+        self.assertEqual(self.read_messages(subscriber), [RELOAD_MESSAGE])
+        self.assertEqual(self.feed.gaps, {})
+
+    def test_replay_by_last_event_id(self):
+        self.feed.subscribe()
+        self.feed.poll()
+        created_event = OrderEvent.objects.get()
+        self.order.status = 4
+        self.order.save()
+        self.feed.poll()
+
+        _, replay = self.feed.subscribe(created_event.id)
+        self.assertEqual(len(replay), 1)
+        self.assertIn(b'"kind":"status","html":null', replay[0])
+        _, replay = self.feed.subscribe(0)
+        self.assertEqual(replay, [RELOAD_MESSAGE])
+
+    @override_settings(ORDER_FEED_MAX_SECONDS=0)
+    def test_stream_view(self):
+        with patch('restaurateur.views.order_feed', self.feed):
+            self.feed.subscribe()
+            self.feed.poll()
+            event = OrderEvent.objects.get()
+            self.assertEqual(len(self.feed.subscribers), 1)
+
+            response = self.client.get(
+                reverse('restaurateur:orders_feed'),
+                HTTP_LAST_EVENT_ID='0',
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertEqual(
+                list(response.streaming_content)[1:],
+                [RELOAD_MESSAGE],
+            )
+            self.assertEqual(len(self.feed.subscribers), 1)
+
+            response = self.client.get(reverse('restaurateur:orders_feed'))
+            self.assertEqual(len(list(response.streaming_content)), 1)
+            self.assertIn(str(event.id).encode(), self.feed.buffer[0][1])
+
+    @override_settings(ORDER_FEED_MAX_CONNECTIONS=1, ORDER_FEED_BUSY_RETRY_MS=30000)
+    def test_connections_limit(self):
+        """Лишняя лента не занимает поток: клиенту - только пауза до повтора."""
+        subscriber, _ = self.feed.subscribe()
+        self.assertEqual(list(self.feed.stream()), [b'retry: 30000\n\n'])
+        self.assertEqual(self.feed.subscribers, {subscriber})
+
+
+class TestProductsPage(TestCase):
+
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create(username='manager', is_staff=True)
+        )
+        self.burger = Product.objects.create(name='burger', price=100, image='burger.jpg')
+        self.fries = Product.objects.create(name='fries', price=50, image='fries.jpg')
+        self.first = Restaurant.objects.create(name='a first')
+        self.second = Restaurant.objects.create(name='b second')
+        RestaurantMenuItem.objects.create(restaurant=self.first, product=self.burger)
+        RestaurantMenuItem.objects.create(
+            restaurant=self.second,
+            product=self.burger,
+            availability=False,
+        )
+        RestaurantMenuItem.objects.create(restaurant=self.second, product=self.fries)
+        cache.clear()
+
+    def get_rows(self):
+        response = self.client.get(reverse('restaurateur:ProductsView'))
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        return {
+            row.split('<td>')[2].split('</td>')[0]: re.findall(r'class="(\w+)"', row)
+            for row in content.split('<tr>')
+            if 'height="50px"' in row
+        }
+
+    def test_matrix(self):
+        self.assertEqual(self.get_rows(), {
+            'burger': ['available', 'unavailable'],
+            'fries': ['unavailable', 'available'],
+        })
+
+    def test_cached_until_menu_changes(self):
+        self.get_rows()
+        # Сессия, пользователь и версии продуктов, ресторанов и меню
+        with self.assertNumQueries(5):
+            self.get_rows()
+
+        menu_item = RestaurantMenuItem.objects.get(restaurant=self.first, product=self.burger)
+        menu_item.availability = False
+        menu_item.save()
+        self.assertEqual(self.get_rows()['burger'], ['unavailable', 'unavailable'])
+
+        # Так меню меняет другой процесс: без сигналов в этом
+        RestaurantMenuItem.objects.filter(restaurant=self.second, product=self.fries) \
+                                  .update(availability=False, updated_at=timezone.now())
+        self.assertEqual(self.get_rows()['fries'], ['unavailable', 'unavailable'])
@@ -14,6 +14,12 @@ urlpatterns = [
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/feed/', views.view_orders_feed, name="orders_feed"),
+    path(
+        'api/orders/<int:order_id>/candidates/',
+        views.view_order_candidates,
+        name="order_candidates",
+    ),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
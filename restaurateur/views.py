@@ -1,14 +1,24 @@
+from itertools import chain
+
 from django import forms
-from django.shortcuts import redirect, render
+from django.conf import settings
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.html import format_html
 from django.views import View
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
 
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
-from foodcartapp.models import Product, Restaurant, Order, RestaurantMenuItem
-from address.models import Address
-from coordinates import find_coordinates
+from fast_json import JSONResponse
+from foodcartapp.menu_matrix import AvailabilityMatrix, get_menu_matrix
+from foodcartapp.models import Order, Product, Restaurant, RestaurantMenuItem
+
+from .feed import order_feed
+from .pagination import get_keyset_page, make_order_cursor, parse_order_cursor
 
 
 class Login(forms.Form):
@@ -28,6 +38,55 @@ class Login(forms.Form):
     )
 
 
+class OrdersFilter(forms.Form):
+    status = forms.TypedChoiceField(
+        label='Статус', required=False, coerce=int, empty_value=None,
+        choices=[('', 'Все')] + [
+            (status, name) for status, name in Order.ORDER_STATUSES if status < 4
+        ],
+    )
+    payment = forms.TypedChoiceField(
+        label='Оплата', required=False, coerce=int, empty_value=None,
+        choices=[('', 'Все')] + list(Order.PAYMENT_METHOD),
+    )
+    restaurant = forms.ChoiceField(
+        label='Ресторан', required=False,
+        choices=[('', 'Все'), ('assigned', 'Назначен'), ('unassigned', 'Не назначен')],
+    )
+    registrated_from = forms.DateTimeField(
+        label='Зарегистрирован с', required=False,
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+        input_formats=['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M', '%Y-%m-%d'],
+    )
+    registrated_to = forms.DateTimeField(
+        label='по', required=False,
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+        input_formats=['%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M', '%Y-%m-%d'],
+    )
+    page_size = forms.IntegerField(label='На странице', required=False, min_value=1)
+
+    def filter(self, orders):
+        """Фильтры применяются в базе - на странице только подходящие заказы."""
+        data = self.cleaned_data
+        if data['status'] is not None:
+            orders = orders.filter(status=data['status'])
+        if data['payment'] is not None:
+            orders = orders.filter(payment=data['payment'])
+        if data['restaurant']:
+            orders = orders.filter(
+                cooking_restaurant__isnull=data['restaurant'] == 'unassigned',
+            )
+        if data['registrated_from']:
+            orders = orders.filter(registrated_at__gte=data['registrated_from'])
+        if data['registrated_to']:
+            orders = orders.filter(registrated_at__lt=data['registrated_to'])
+        return orders
+
+    def get_page_size(self):
+        page_size = self.cleaned_data['page_size'] or settings.MANAGER_ORDERS_PAGE_SIZE
+        return min(page_size, settings.MANAGER_ORDERS_MAX_PAGE_SIZE)
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -62,26 +121,78 @@ def is_manager(user):
     return user.is_staff  # FIXME replace with specific permission
 
 
-@user_passes_test(is_manager, login_url='restaurateur:login')
-def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [
-            availability.get(restaurant.id, False) for restaurant in restaurants
-        ]
-
-        products_with_restaurant_availability.append(
-            (product, ordered_availability)
-        )
+PRODUCT_ROWS_MARKER = '<!-- product rows -->'
+PRODUCT_ROWS_CHUNK_SIZE = 50
+AVAILABILITY_CELLS = ('<td class="unavailable"></td>', '<td class="available"></td>')
 
-    return render(request, template_name="products_list.html", context={
-        'products_with_restaurant_availability': products_with_restaurant_availability,
+
+def load_menu():
+    """Строки таблицы меню и матрица наличия: три запроса без моделей."""
+    restaurants = list(
+        Restaurant.objects.order_by('name').values('id', 'name')
+    )
+    products = Product.objects.order_by('id') \
+                              .values_list('id', 'name', 'category__name', 'price', 'image')
+    storage = Product._meta.get_field('image').storage
+    # reverse на каждый продукт дороже, чем подстановка id в готовый url
+    change_url = reverse('admin:foodcartapp_product_change', args=('{}',))
+    product_rows = []
+    for product_id, name, category, price, image in products:
+        product_rows.append((
+            format_html(
+                '<tr><td><img src="{}" alt="{}" height="50px"></td>'
+                '<td>{}</td><td>{}</td><td>{}</td>',
+                storage.url(image), name, name, category or '', price,
+            ),
+            format_html(
+                '<td><a href="{}">ред.</a></td></tr>\n',
+                change_url.replace('%7B%7D', str(product_id)),
+            ),
+        ))
+    return {
         'restaurants': restaurants,
-    })
+        'product_rows': product_rows,
+        'matrix': AvailabilityMatrix(
+            [product[0] for product in products],
+            [restaurant['id'] for restaurant in restaurants],
+            RestaurantMenuItem.objects.filter(availability=True)
+                                      .values_list('product_id', 'restaurant_id'),
+        ),
+    }
+
+
+def render_product_rows(menu):
+    """HTML строк таблицы меню частями по PRODUCT_ROWS_CHUNK_SIZE строк."""
+    chunk = []
+    for (row_start, row_end), cells in zip(menu['product_rows'], menu['matrix'].cells):
+        chunk.append(row_start)
+        chunk.extend(AVAILABILITY_CELLS[cell] for cell in cells.tolist())
+        chunk.append(row_end)
+        if len(chunk) >= PRODUCT_ROWS_CHUNK_SIZE * (len(cells) + 2):
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_products(request):
+    menu = get_menu_matrix(
+        load_menu,
+        version=(
+            Product.objects.get_version(),
+            Restaurant.objects.get_version(),
+            RestaurantMenuItem.objects.get_version(),
+        ),
+    )
+    page = render_to_string(
+        'products_list.html',
+        {'restaurants': menu['restaurants']},
+        request=request,
+    )
+    page_start, page_end = page.split(PRODUCT_ROWS_MARKER)
+    return StreamingHttpResponse(
+        chain([page_start], render_product_rows(menu), [page_end]),
+    )
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
@@ -93,35 +204,91 @@ def view_restaurants(request):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = Order.objects.get_not_complete_orders() \
-        .prefetch_related('products') \
-        .get_cooking_restaurant_name() \
-        .order_by('status')
-
-    restaurants_products = RestaurantMenuItem.objects\
-                                             .get_restaurants_with_products()
-    address_in_db = {
-        address.address: (address.longitude, address.latitude) for address in Address.objects.all()
-    }
+    orders = Order.objects.get_not_complete_orders().get_cooking_restaurant_name()
+    filter_form = OrdersFilter(request.GET)
+    if filter_form.is_valid():
+        orders = filter_form.filter(orders)
+        page_size = filter_form.get_page_size()
+    else:
+        page_size = settings.MANAGER_ORDERS_PAGE_SIZE
 
-    # Для каждого заказа найдем рестораны, способные приготовить все продукты
-    for order in orders:
-        if order.restaurant_name:
-            continue
-        order_coordinates = find_coordinates(
-            address=order.address,
-            coordinates=address_in_db,
-        )
-        suitable_restaurants = order.find_suitable_restaurants(
-            restaurants_products=restaurants_products,
-            addresses=address_in_db,
-            order_coordinates=order_coordinates,
+    try:
+        after = request.GET.get('after') and parse_order_cursor(request.GET['after'])
+        before = request.GET.get('before') and parse_order_cursor(request.GET['before'])
+    except ValueError:
+        # Поврежденный курсор - показываем первую страницу
+        after = before = None
+    order_items, has_previous, has_next = get_keyset_page(
+        orders,
+        page_size,
+        after=after,
+        before=before,
+    )
+
+    context = {
+        'order_items': order_items,
+        'filter_form': filter_form,
+    }
+    if order_items and has_previous:
+        context['previous_page_url'] = get_page_url(
+            request, 'before', make_order_cursor(order_items[0]),
         )
-        order.suitable_restaurants = order.find_common_restaurant(
-            restaurants=suitable_restaurants,
+    if order_items and has_next:
+        context['next_page_url'] = get_page_url(
+            request, 'after', make_order_cursor(order_items[-1]),
         )
-    return render(
-        request,
-        template_name='order_items.html',
-        context={'order_items': orders},
+    return render(request, template_name='order_items.html', context=context)
+
+
+def get_page_url(request, direction, cursor):
+    """Ссылка на соседнюю страницу с теми же фильтрами."""
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[direction] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_feed(request):
+    """Изменения заказов в формате server-sent events."""
+    try:
+        last_event_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_event_id = None
+    response = StreamingHttpResponse(
+        order_feed.stream(last_event_id),
+        content_type='text/event-stream',
     )
+    response['Cache-Control'] = 'no-cache'
+    # nginx не должен копить поток в буфере
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_order_candidates(request, order_id):
+    """Ближайшие рестораны, способные приготовить весь заказ, в JSON."""
+    order = get_object_or_404(Order, pk=order_id)
+    try:
+        k = int(request.GET.get('k', settings.ORDER_CANDIDATES_TOP_K))
+    except ValueError:
+        return JSONResponse({'error': 'k должно быть числом'}, status=400)
+    k = min(max(k, 1), settings.ORDER_CANDIDATES_MAX_K)
+
+    candidates = order.candidates.select_related('restaurant') \
+                                 .order_by(F('distance_km').asc(nulls_last=True))
+    return JSONResponse({
+        'order': order.id,
+        'candidates': [
+            {
+                'id': candidate.restaurant.id,
+                'name': candidate.restaurant.name,
+                'distance_km': (
+                    None if candidate.distance_km is None
+                    else float(candidate.distance_km)
+                ),
+            }
+            for candidate in candidates[:k]
+        ],
+    })
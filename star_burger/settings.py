@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 
 from environs import Env
@@ -36,6 +37,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'fast_json.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,6 +96,11 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Уменьшенные копии картинок товаров для srcset и админки
+IMAGE_RENDITION_WIDTHS = (100, 300, 600)
+IMAGE_RENDITION_FORMATS = ('WEBP', 'JPEG')
+IMAGE_RENDITION_QUALITY = 80
+
 DATABASES = {
     'default': dj_database_url.config(
         default=env('DB_URL')
@@ -141,3 +148,108 @@ STATICFILES_DIRS = [
 PHONENUMBER_DEFAULT_REGION = 'RU'
 PHONENUMBER_DB_FORMAT = 'NATIONAL'
 PHONENUMBER_DEFAULT_FORMAT = 'NATIONAL'
+# Сколько разобранных номеров держать в памяти процесса
+PHONE_CACHE_SIZE = env.int('PHONE_CACHE_SIZE', 10000)
+
+# haversine — быстрый векторный расчет, geodesic — точный по эллипсоиду
+DISTANCE_MODE = env('DISTANCE_MODE', 'haversine')
+
+GEOCODE_TIMEOUT = env.float('GEOCODE_TIMEOUT', 5)
+GEOCODE_RETRIES = env.int('GEOCODE_RETRIES', 3)
+GEOCODE_BACKOFF = env.float('GEOCODE_BACKOFF', 0.5)
+GEOCODE_QPS = env.float('GEOCODE_QPS', 10)
+GEOCODE_WORKERS = env.int('GEOCODE_WORKERS', 8)
+GEOCODE_LRU_SIZE = env.int('GEOCODE_LRU_SIZE', 10000)
+GEOCODE_CACHE_TTL_DAYS = env.int('GEOCODE_CACHE_TTL_DAYS', 90)
+GEOCODE_NEGATIVE_TTL_DAYS = env.int('GEOCODE_NEGATIVE_TTL_DAYS', 1)
+# Адрес из очереди, на который геокодер не ответил, откладывается на
+# GEOCODE_RETRY_DELAY, удваивая паузу с каждой неудачей до GEOCODE_RETRY_MAX_DELAY
+GEOCODE_RETRY_DELAY = timedelta(minutes=env.int('GEOCODE_RETRY_DELAY_MINUTES', 1))
+GEOCODE_RETRY_MAX_DELAY = timedelta(hours=env.int('GEOCODE_RETRY_MAX_DELAY_HOURS', 24))
+
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+
+# Рестораны дальше этого радиуса не предлагаются для заказа, 0 - без ограничений
+MAX_DELIVERY_RADIUS_KM = env.float('MAX_DELIVERY_RADIUS_KM', 50) or None
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'fast_json.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Сколько хранятся отметки об удаленных продуктах для /api/products/?since=.
+# Клиент с курсором старше должен скачать каталог целиком
+PRODUCTS_TOMBSTONE_TTL = timedelta(days=env.int('PRODUCTS_TOMBSTONE_TTL_DAYS', 30))
+# Изменения, записанные транзакциями, которые еще не закоммитились на момент
+# выдачи курсора, попадают в следующую выборку за счет этого перекрытия
+PRODUCTS_SYNC_OVERLAP = timedelta(seconds=5)
+# Каталог в кэше ищется по версии данных из базы. Срок хранения ограничивает
+# жизнь старых версий и копий, собранных до коммита более ранней правки
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', 300)
+
+# Сколько хранится ответ на запрос с Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=env.int('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+# Режим очереди приема заказов: заказ подтверждается после записи в локальный
+# SQLite-файл, в основную базу его переносит drain_order_spool. Временные номера
+# заказов уникальны только в пределах одного файла очереди
+ORDER_SPOOL_ENABLED = env.bool('ORDER_SPOOL_ENABLED', False)
+ORDER_SPOOL_PATH = env.str('ORDER_SPOOL_PATH', os.path.join(BASE_DIR, 'order_spool.sqlite3'))
+
+# Пакетная загрузка заказов /api/orders/batch/
+ORDER_BATCH_MAX_SIZE = env.int('ORDER_BATCH_MAX_SIZE', 1000)
+ORDER_BATCH_CHUNK_SIZE = 100
+
+# Список заказов в админке считает строки точно, только если планировщик
+# Postgres ожидает меньше этого числа
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Сколько пар (ресторан, продукт) можно передать в /api/menu/availability/
+MENU_AVAILABILITY_MAX_ITEMS = 10000
+# Матрица меню менеджера в кэше ищется по версии данных из базы, срок
+# хранения - как у CATALOG_CACHE_TIMEOUT
+MENU_MATRIX_CACHE_TIMEOUT = env.int('MENU_MATRIX_CACHE_TIMEOUT', 300)
+
+# JSON-ответы меньше этого размера не сжимаются
+JSON_COMPRESSION_MIN_BYTES = env.int('JSON_COMPRESSION_MIN_BYTES', 1024)
+
+# Страница заказов менеджера: размер по умолчанию и верхняя граница ?page_size=
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+MANAGER_ORDERS_MAX_PAGE_SIZE = 200
+
+# Живая лента заказов /manager/orders/feed/ (server-sent events).
+# События хранятся ORDER_EVENTS_TTL, транслятор читает их раз в
+# ORDER_FEED_POLL_INTERVAL секунд или сразу по NOTIFY на Postgres
+# и удаляет устаревшие раз в ORDER_EVENTS_PURGE_INTERVAL
+ORDER_EVENTS_TTL = timedelta(hours=1)
+ORDER_EVENTS_PURGE_INTERVAL = timedelta(minutes=5)
+ORDER_FEED_POLL_INTERVAL = env.float('ORDER_FEED_POLL_INTERVAL', 1)
+ORDER_FEED_OVERLAP = timedelta(seconds=5)
+# Столько ждем событие транзакции, которая получила id, но еще не закоммитилась.
+# Не дождались - страницы менеджеров получают reload
+ORDER_FEED_GAP_TIMEOUT = timedelta(seconds=env.int('ORDER_FEED_GAP_TIMEOUT', 60))
+ORDER_FEED_BUFFER_SIZE = 1000
+ORDER_FEED_QUEUE_SIZE = 1000
+ORDER_FEED_HEARTBEAT = 15
+# Соединение закрывается через столько секунд, браузер переподключается сам
+ORDER_FEED_MAX_SECONDS = env.int('ORDER_FEED_MAX_SECONDS', 300)
+ORDER_FEED_RETRY_MS = 3000
+# Открытая лента держит поток gunicorn. Лент на процесс не больше этого числа -
+# заметно меньше --threads, чтобы остальным запросам хватало потоков.
+# Лишние клиенты переподключаются через ORDER_FEED_BUSY_RETRY_MS
+ORDER_FEED_MAX_CONNECTIONS = env.int('ORDER_FEED_MAX_CONNECTIONS', 8)
+ORDER_FEED_BUSY_RETRY_MS = 30000
+
+ORDER_CANDIDATES_TOP_K = env.int('ORDER_CANDIDATES_TOP_K', 5)
+ORDER_CANDIDATES_MAX_K = 50
+
+# Автоназначение ресторанов: 'greedy' или 'min-cost' (нужен scipy)
+ASSIGNMENT_STRATEGY = env.str('ASSIGNMENT_STRATEGY', 'greedy')
+# Во сколько км расстояния обходится один заказ, который ресторан уже готовит
+ASSIGNMENT_LOAD_PENALTY_KM = env.float('ASSIGNMENT_LOAD_PENALTY_KM', 2)
+ASSIGNMENT_MAX_LOAD = env.int('ASSIGNMENT_MAX_LOAD', None)
+ASSIGNMENT_MAX_CANDIDATES = 10